@@ -1,6 +1,7 @@
 from app import create_app
 
-app = create_app()
-
+# Built under the guard: image workers (forkserver/spawn) re-import this
+# script as their __main__ and must not start a second app
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
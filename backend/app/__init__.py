@@ -3,9 +3,18 @@ from flask_cors import CORS
 from app.config import Config
 from flask_jwt_extended import JWTManager
 from authlib.integrations.flask_client import OAuth
-from app.db import init_app as init_db
+from app.db import init_app as init_db, pool_stats
+from app.db.cache import cache_stats, versions_stats
+from app.db.prepared import prepared_stats
 from app.models.token import TokenBlocklist
+from app.jobs import photo_jobs
+from app.storage import get_storage, LocalStorage
+from app.static_files import StaticIndex, compress_folder
+from app.responses import init_app as init_responses
+from app.metrics import init_app as init_metrics
+from app.scheduler import leader_only, leadership
 from flask_apscheduler import APScheduler
+import click
 import os
 
 # Initialize extensions
@@ -22,12 +31,23 @@ def create_app():
   app = Flask(__name__, static_folder=static_folder)
   app.config.from_object(Config)
   
-  # Initialize Database Teardown
+  # Initialize Database Teardown and pool warm-up
   init_db(app)
 
-  # Initialize Scheduler
+  # Faster JSON encoding and response compression
+  init_responses(app)
+
+  # Request timing, Server-Timing headers and /api/metrics
+  init_metrics(app)
+
+  # Background workers for photo uploads
+  photo_jobs.init_app(app)
+
+  # Initialize Scheduler; its jobs only run in the elected leader process.
+  # Pre-forking launchers (gunicorn.conf.py) start it in each worker instead.
   scheduler.init_app(app)
-  scheduler.start()
+  if app.config.get('SCHEDULER_AUTOSTART'):
+    scheduler.start()
   
   # Initialize Auth Extensions
   jwt.init_app(app)
@@ -38,51 +58,145 @@ def create_app():
       client_kwargs={'scope': 'openid email profile'}
   )
 
-  # Enable CORS for API routes only
-  CORS(app, resources={r"/api/*": {"origins": "*"}})
+  # Enable CORS for API routes only. Auth is a bearer token, not a cookie, so
+  # the wildcard itself is sent rather than the echoed Origin, and responses
+  # do not vary by origin (app.asgi sends the same header)
+  CORS(app, resources={r"/api/*": {"origins": "*"}}, send_wildcard=True)
   
   # Register blueprints
   from app.routes.colleges import colleges_bp
   from app.routes.programs import programs_bp
   from app.routes.students import students_bp
   from app.routes.auth import auth_bp
+  from app.routes.stats import stats_bp
+  from app.routes.admin import admin_bp
   
   app.register_blueprint(colleges_bp, url_prefix='/api/colleges')
   app.register_blueprint(programs_bp, url_prefix='/api/programs')
   app.register_blueprint(students_bp, url_prefix='/api/students')
   app.register_blueprint(auth_bp, url_prefix='/api/auth')
+  app.register_blueprint(stats_bp, url_prefix='/api/stats')
+  if app.config.get('METRICS_TOKEN'):
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
   
   @app.route('/api/health', methods=['GET'])
   def health():
-    return jsonify({'status': 'healthy', 'message': 'SSIS API is running'}), 200
+    return jsonify({
+      'status': 'healthy',
+      'message': 'SSIS API is running',
+      'caches': cache_stats(),
+      'table_versions': versions_stats(),
+      'pool': pool_stats(),
+      'prepared_statements': prepared_stats(),
+      'photo_jobs': photo_jobs.stats(),
+      'scheduler': leadership.stats()
+    }), 200
   
+  # Files stored by the local storage backend; public like Supabase's public URLs
+  @app.route('/api/media/<path:key>', methods=['GET'])
+  def media(key):
+    try:
+      storage = get_storage()
+    except ValueError:
+      storage = None
+    if not isinstance(storage, LocalStorage):
+      return jsonify({'error': 'API endpoint not found'}), 404
+    return send_from_directory(storage.root, key)
+
   # This catch-all route serves the React app's entry point (index.html)
   # for any route that is not an API call or a static file.
+  static_index = StaticIndex(app.static_folder)
+
   @app.route('/', defaults={'path': ''}, methods=['GET'])
   @app.route('/<path:path>', methods=['GET'])
   def serve_react(path):    
     if path.startswith('api/'):
       return jsonify({'error': 'API endpoint not found'}), 404
+    return static_index.serve(path)
+
+  @app.cli.command('compress-static')
+  def compress_static():
+      """Writes .gz/.br siblings of the React build for precompressed serving."""
+      written = compress_folder(app.static_folder)
+      print(f"Wrote {written} compressed files.")
 
-    full_path = os.path.join(app.static_folder, path)
-    if path != "" and os.path.exists(full_path) and os.path.isfile(full_path):
-      return send_from_directory(app.static_folder, path)
-    else:
-      # For all other paths, serve the React app's entry point.
-      if os.path.exists(os.path.join(app.static_folder, 'index.html')):
-        return send_from_directory(app.static_folder, 'index.html')
-      return jsonify({'error': 'React build not found. Please run npm run build'}), 404
-  
   @app.cli.command('cleanup-tokens')
   def cleanup_tokens():
       """Deletes expired tokens from the blocklist."""
       count = TokenBlocklist.cleanup()
       print(f"Cleaned up {count} expired tokens.")
 
+  @app.cli.command('migrate')
+  @click.option('--status', is_flag=True, help='List migrations and whether they are applied.')
+  @click.option('--explain', is_flag=True, help='EXPLAIN the list query shapes and flag sequential scans.')
+  @click.option('--target', type=int, help='Stop after this migration version.')
+  @click.option('--min-rows', type=int, default=1000, help='Only flag sequential scans of tables this large.')
+  def migrate(status, explain, target, min_rows):
+      """Applies pending schema migrations (tables, list indexes, search, stats)."""
+      from app.db import get_db
+      from app.db.migrations import MIGRATIONS, applied_versions, migrate as run_migrations
+      conn = get_db()
+      if status:
+          applied = applied_versions(conn)
+          for version, name, _ in MIGRATIONS:
+              state = f"applied {applied[version]:%Y-%m-%d %H:%M}" if version in applied else 'pending'
+              print(f"{version:>3}  {name:<32} {state}")
+          return
+      if explain:
+          from app.db.explain import explain_listings
+          from app.models.college import College
+          from app.models.program import Program
+          from app.models.student import Student
+          results = explain_listings(conn, {
+              'college': College.LISTING,
+              'program': Program.LISTING,
+              'student': Student.LISTING,
+          }, min_rows)
+          for result in results:
+              flag = 'SEQ ' if result['flagged'] else 'ok  '
+              print(f"{flag}{result['shape']:<48} cost={result['cost']:<10} {'; '.join(result['scans'])}")
+          flagged = sum(result['flagged'] for result in results)
+          print(f"{len(results)} query shapes, {flagged} falling back to sequential scans.")
+          if flagged:
+              raise SystemExit(1)
+          return
+      applied, deferred = run_migrations(conn, target)
+      for version, name, notes in applied:
+          print(f"Applied {version}: {name}" + ''.join(f" ({note})" for note in notes))
+      for version, name, reason in deferred:
+          print(f"Pending {version}: {name} ({reason})")
+      if not applied and not deferred:
+          print("Schema is up to date.")
+
+  @app.cli.command('slow-queries')
+  @click.option('--limit', type=int, default=20, help='How many entries to show, newest first.')
+  @click.option('--plans', is_flag=True, help='Print the captured EXPLAIN ANALYZE plans too.')
+  def slow_queries(limit, plans):
+      """Shows recent slow queries from SLOW_QUERY_FILE."""
+      import json
+      from app.db.slowlog import read_file
+      path = app.config.get('SLOW_QUERY_FILE')
+      if not path:
+          print("SLOW_QUERY_FILE is not set; see /api/admin/slow-queries instead.")
+          return
+      entries = read_file(path, limit)
+      if not entries:
+          print(f"No slow queries recorded in {path}.")
+      for entry in entries:
+          print(f"{entry['at']}  {entry['duration_ms']:>9.1f} ms  {entry['caller']}  {entry.get('shape', '-')}  ({entry.get('endpoint') or '-'})")
+          print(f"  {entry['sql']}")
+          print(f"  params: {entry['params']}  rows: {entry['rows']}")
+          if entry.get('plan_error'):
+              print(f"  explain failed: {entry['plan_error']}")
+          elif plans and entry.get('plan'):
+              print('  ' + json.dumps(entry['plan'], indent=2).replace('\n', '\n  '))
+
   # Run cleanup every hour
   @scheduler.task('interval', id='cleanup_tokens', hours=1)
+  @leader_only
   def scheduled_cleanup():
       with app.app_context():
           TokenBlocklist.cleanup()
+          photo_jobs.cleanup()
   
-  return app
\ No newline at end of file
+  return app
@@ -0,0 +1,269 @@
+"""
+ASGI application for serving under uvicorn (see backend/asgi.py). The read
+endpoints that dominate traffic - the student, college and program lists and
+the student detail - are answered natively on asyncpg (app.db.aio), so a slow
+query holds a coroutine rather than a worker thread. Every other request goes
+to the Flask app unchanged, on a2wsgi's thread pool.
+"""
+import logging
+import time
+from urllib.parse import parse_qsl
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException, NoAuthorizationError
+from jwt import ExpiredSignatureError, InvalidTokenError
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header, parse_etags
+from app.config import Config
+from app.db import aio
+from app.metrics import async_request, add_timing, request_latency, server_timing
+from app.models.college import College
+from app.models.program import Program
+from app.models.student import Student
+from app.models.token import TokenBlocklist
+from app.models.user import User
+from app.responses import choose_encoding, compress_body
+from app.routes.conditional import CACHE_CONTROL, etag
+from app.routes.formats import list_payload
+from app.routes.students import filter_args
+
+try:
+  from a2wsgi import WSGIMiddleware
+except ImportError:
+  WSGIMiddleware = None
+
+logger = logging.getLogger(__name__)
+
+def _page_args(args, default_sort):
+  return {
+    'page': int(args.get('page', 1)),
+    'per_page': int(args.get('per_page', 10)),
+    'sort_by': args.get('sort_by', default_sort),
+    'order': args.get('order', 'asc'),
+    'cursor': args.get('cursor'),
+    'count': args.get('count', 'exact'),
+    'search_mode': args.get('search_mode', 'contains'),
+  }
+
+async def _students(conn, args):
+  filters = filter_args(args)
+  result = await Student.get_all_async(
+    conn, **_page_args(args, 'student_id'),
+    search_term=filters['search_term'],
+    program_code=filters['program_code'],
+    year_level=filters['year_level'],
+    gender=filters['gender'],
+    facets=args.get('facets', '').lower() == 'true'
+  )
+  return 200, list_payload(result, args.get('format', 'rows'), Student.COLUMNS + ('photo_urls',))
+
+async def _student(conn, args, id):
+  student = await Student.get_by_id_async(conn, id)
+  if not student:
+    return 404, {'error': 'Student not found'}
+  return 200, student
+
+async def _colleges(conn, args):
+  result = await College.get_all_async(conn, **_page_args(args, 'college_code'), search_term=args.get('search'))
+  return 200, list_payload(result, args.get('format', 'rows'), College.COLUMNS)
+
+async def _programs(conn, args):
+  result = await Program.get_all_async(conn, **_page_args(args, 'program_code'), search_term=args.get('search'))
+  return 200, list_payload(result, args.get('format', 'rows'), Program.COLUMNS)
+
+def _all_rows(args):
+  # only_codes stays on the Flask side (college and program codes come from the
+  # in-memory reference caches); parsed as the views parse it
+  return args.get('only_codes', '').lower() != 'true'
+
+# Flask endpoint: (tables its ETag covers, handler, whether these args are served natively)
+NATIVE = {
+  'students.get_students': (('student',), _students, _all_rows),
+  'students.get_student': (('student',), _student, lambda args: True),
+  'colleges.get_colleges': (('college',), _colleges, _all_rows),
+  'programs.get_programs': (('program',), _programs, _all_rows),
+}
+
+class AuthError(Exception):
+  def __init__(self, status, msg):
+    super().__init__(msg)
+    self.status = status
+
+class AsgiApp:
+  """
+  Routes with the Flask URL map, so paths, converters and slashes resolve
+  the same way, and answers the NATIVE endpoints with the same checks and
+  headers as their views: JWT (including the blocklist), ETag/304, CORS,
+  compression, Server-Timing and the request metrics.
+  """
+  def __init__(self, flask_app):
+    self.flask_app = flask_app
+    self.urls = flask_app.url_map.bind('localhost')
+    self.wsgi = WSGIMiddleware(flask_app, workers=Config.ASGI_WSGI_THREADS)
+    self.native = aio.asyncpg is not None
+    self.timing = flask_app.config.get('SERVER_TIMING')
+    self.compress = flask_app.config.get('COMPRESS_RESPONSES')
+    self.min_size = flask_app.config.get('COMPRESS_MIN_SIZE', 1024)
+    if not self.native:
+      logger.warning('asyncpg is not installed; every request is served by the Flask app')
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self._lifespan(receive, send)
+    if self.native and scope['type'] == 'http' and scope['method'] == 'GET':
+      route = self._match(scope)
+      if route is not None:
+        return await self._serve(scope, send, *route)
+    await self.wsgi(scope, receive, send)
+
+  def _match(self, scope):
+    try:
+      endpoint, values = self.urls.match(scope['path'], method='GET')
+    except HTTPException:
+      return None
+    if endpoint not in NATIVE:
+      return None
+    query = scope.get('query_string', b'').decode('latin-1')
+    args = MultiDict(parse_qsl(query, keep_blank_values=True, errors='replace'))
+    if not NATIVE[endpoint][2](args):
+      return None
+    return endpoint, values, args, f"{scope['path']}?{query}"
+
+  async def _serve(self, scope, send, endpoint, values, args, full_path):
+    started = time.perf_counter()
+    headers = {}
+    for name, value in scope['headers']:
+      name = name.decode('latin-1')
+      value = value.decode('latin-1')
+      headers[name] = f'{headers[name]}, {value}' if name in headers else value
+
+    state = async_request.set({'endpoint': endpoint, 'timings': {}})
+    try:
+      status, payload, tag = await self._respond(headers, endpoint, values, args, full_path)
+      body = b'' if status == 304 else self.flask_app.json.dumps(payload).encode()
+      response = [('Content-Type', self.flask_app.json.mimetype)]
+      vary = []
+
+      if status in (200, 304) and tag:
+        response += [('ETag', f'W/"{tag}"'), ('Cache-Control', CACHE_CONTROL)]
+        vary.append('Authorization')
+      elif tag:
+        response.append(('Cache-Control', 'no-store'))
+
+      if self.compress and status not in (204, 304):
+        vary.append('Accept-Encoding')
+        if len(body) >= self.min_size:
+          encoding = choose_encoding(parse_accept_header(headers.get('accept-encoding')))
+          if encoding:
+            body = compress_body(body, encoding)
+            response.append(('Content-Encoding', encoding))
+      if vary:
+        response.append(('Vary', ', '.join(vary)))
+      # As Flask-CORS is set up in create_app()
+      response.append(('Access-Control-Allow-Origin', '*'))
+      response.append(('Content-Length', str(len(body))))
+
+      total = time.perf_counter() - started
+      request_latency.observe(total, endpoint, 'GET', status)
+      if self.timing:
+        response.append(('Server-Timing', server_timing(total, async_request.get()['timings'])))
+    finally:
+      async_request.reset(state)
+
+    await send({
+      'type': 'http.response.start',
+      'status': status,
+      'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+  async def _respond(self, headers, endpoint, values, args, full_path):
+    """(status, payload, etag); the etag is None when the request never got past auth."""
+    try:
+      await self._authenticate(headers)
+    except AuthError as e:
+      return e.status, {'msg': str(e)}, None
+
+    tables, handler, _ = NATIVE[endpoint]
+    tag = etag(tables, full_path)
+    if parse_etags(headers.get('if-none-match')).contains_weak(tag):
+      return 304, None, tag
+
+    try:
+      async with aio.connection() as conn:
+        status, payload = await handler(conn, args, **values)
+    except ValueError as e:
+      return 400, {'error': str(e)}, tag
+    except Exception as e:
+      return 500, {'error': str(e)}, tag
+    return status, payload, tag
+
+  async def _authenticate(self, headers):
+    """@jwt_required() for an Authorization header (token, blocklist, user lookup), with flask_jwt_extended's responses."""
+    header = headers.get('authorization', '').strip().strip(',')
+    tokens = [value for value in header.split(',') if value.split() and value.split()[0] == 'Bearer']
+    try:
+      if not header:
+        raise NoAuthorizationError('Missing Authorization Header')
+      if len(tokens) != 1:
+        raise NoAuthorizationError("Missing 'Bearer' type in 'Authorization' header. Expected 'Authorization: Bearer <JWT>'")
+      parts = tokens[0].split()
+      if len(parts) != 2:
+        raise AuthError(422, "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'")
+      with self.flask_app.app_context():
+        decoded = decode_token(parts[1])
+    except NoAuthorizationError as e:
+      raise AuthError(401, str(e))
+    except ExpiredSignatureError:
+      raise AuthError(401, 'Token has expired')
+    except (InvalidTokenError, JWTExtendedException) as e:
+      raise AuthError(422, str(e))
+
+    if decoded.get('type') != 'access':
+      raise AuthError(422, 'Only non-refresh tokens are allowed')
+
+    started = time.perf_counter()
+    try:
+      revoked = await TokenBlocklist.is_revoked_async(decoded['jti'], _fetch)
+    finally:
+      add_timing('auth', time.perf_counter() - started, 1)
+    if revoked:
+      raise AuthError(401, 'Token has been revoked')
+
+    # The user lookup app.routes.auth registers with JWTManager
+    started = time.perf_counter()
+    try:
+      user = await User.identity_async(decoded['sub'], _fetch)
+    finally:
+      add_timing('auth', time.perf_counter() - started, 1)
+    if user is None:
+      raise AuthError(401, f"Error loading the user {decoded['sub']}")
+
+  async def _lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        if self.native and Config.DB_POOL_WARMUP:
+          try:
+            await aio.open_pool()
+          except Exception as e:
+            # Opened again on the first native request, like the Flask pool's warm-up
+            logger.warning('Async database pool warm-up failed: %s', e)
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await aio.close_pool()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+async def _fetch(query, params):
+  async with aio.connection() as conn:
+    return await aio.fetch(conn, query, params)
+
+def create_asgi_app(flask_app=None):
+  """Wraps `flask_app` (by default a new create_app()) for an ASGI server."""
+  if WSGIMiddleware is None:
+    raise RuntimeError('a2wsgi is required for ASGI mode')
+  if flask_app is None:
+    from app import create_app
+    flask_app = create_app()
+  return AsgiApp(flask_app)
@@ -11,9 +11,45 @@ class Config:
   DB_NAME = getenv('DB_NAME')
   DB_USER = getenv('DB_USERNAME')
   DB_PASSWORD = getenv('DB_PASSWORD')
+  DB_SSLMODE = getenv('DB_SSLMODE', 'require')
+  DB_CONNECT_TIMEOUT = int(getenv('DB_CONNECT_TIMEOUT', '10'))
+  DB_POOL_MIN = int(getenv('DB_POOL_MIN', '1'))
+  DB_POOL_MAX = int(getenv('DB_POOL_MAX', '20'))
+  DB_POOL_TIMEOUT = float(getenv('DB_POOL_TIMEOUT', '10'))
+  DB_POOL_MAX_LIFETIME = float(getenv('DB_POOL_MAX_LIFETIME', '1800'))
+  DB_POOL_IDLE_CHECK = float(getenv('DB_POOL_IDLE_CHECK', '30'))
+  DB_POOL_WARMUP = getenv('DB_POOL_WARMUP', 'true').lower() == 'true'
+  DB_PREPARED_STATEMENTS = getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
+  ASYNC_DB_POOL_MIN = int(getenv('ASYNC_DB_POOL_MIN', '1'))
+  ASYNC_DB_POOL_MAX = int(getenv('ASYNC_DB_POOL_MAX', '20'))
+  ASYNC_DB_POOL_IDLE_TIMEOUT = float(getenv('ASYNC_DB_POOL_IDLE_TIMEOUT', '300'))
+  ASGI_WSGI_THREADS = int(getenv('ASGI_WSGI_THREADS', '10'))
   JWT_SECRET_KEY = getenv('JWT_SECRET_KEY', 'your-secret-key')
   GOOGLE_CLIENT_ID = getenv('GOOGLE_CLIENT_ID')
   GOOGLE_CLIENT_SECRET = getenv('GOOGLE_CLIENT_SECRET')
   SUPABASE_URL = getenv('SUPABASE_URL')
   SUPABASE_KEY = getenv('SUPABASE_KEY')
-  JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
\ No newline at end of file
+  STORAGE_BACKEND = getenv('STORAGE_BACKEND', 'supabase')
+  STORAGE_BUCKET = getenv('STORAGE_BUCKET', 'SSIS')
+  LOCAL_STORAGE_DIR = getenv('LOCAL_STORAGE_DIR', 'uploads')
+  LOCAL_STORAGE_URL = getenv('LOCAL_STORAGE_URL', '/api/media')
+  UPLOAD_SPOOL_DIR = getenv('UPLOAD_SPOOL_DIR')
+  UPLOAD_WORKERS = int(getenv('UPLOAD_WORKERS', '2'))
+  UPLOAD_QUEUE_SIZE = int(getenv('UPLOAD_QUEUE_SIZE', '32'))
+  IMAGE_WORKERS = int(getenv('IMAGE_WORKERS', '2'))
+  FAST_JSON = getenv('FAST_JSON', 'true').lower() == 'true'
+  COMPRESS_RESPONSES = getenv('COMPRESS_RESPONSES', 'true').lower() == 'true'
+  COMPRESS_MIN_SIZE = int(getenv('COMPRESS_MIN_SIZE', '1024'))
+  SERVER_TIMING = getenv('SERVER_TIMING', 'false').lower() == 'true'
+  METRICS_TOKEN = getenv('METRICS_TOKEN')
+  SLOW_QUERY_MS = float(getenv('SLOW_QUERY_MS', '200'))
+  SLOW_QUERY_EXPLAIN_RATE = float(getenv('SLOW_QUERY_EXPLAIN_RATE', '0.1'))
+  SLOW_QUERY_BUFFER = int(getenv('SLOW_QUERY_BUFFER', '100'))
+  SLOW_QUERY_FILE = getenv('SLOW_QUERY_FILE')
+  JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
+  REVOCATION_REFRESH_SECONDS = int(getenv('REVOCATION_REFRESH_SECONDS', '5'))
+  COUNT_CACHE_TTL = int(getenv('COUNT_CACHE_TTL', '60'))
+  REFERENCE_CACHE_TTL = int(getenv('REFERENCE_CACHE_TTL', '600'))
+  SCHEDULER_AUTOSTART = getenv('SCHEDULER_AUTOSTART', 'true').lower() == 'true'
+  USER_CACHE_TTL = int(getenv('USER_CACHE_TTL', '300'))
+  USER_CACHE_SIZE = int(getenv('USER_CACHE_SIZE', '1024'))
\ No newline at end of file
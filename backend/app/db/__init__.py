@@ -1,38 +1,83 @@
-import psycopg2
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+import os
+import threading
+import time
 from flask import g
 from app.config import Config
+from app.db.pool import ConnectionPool
+from app.metrics import add_timing, pool_wait
 
 pg_pool = None
+_pool_lock = threading.Lock()
+# Pools inherited across fork() are parked here: closing (or garbage collecting)
+# them in the child would terminate the parent's sessions on the shared sockets.
+_orphaned_pools = []
 
-def get_db_connection():
+def get_pool():
+  """Returns this process's pool, creating it on first use."""
   global pg_pool
-  if pg_pool is None:
-    pg_pool = psycopg2.pool.ThreadedConnectionPool(
-      minconn=1,
-      maxconn=20,
-      host=Config.DB_HOST,
-      port=Config.DB_PORT,
-      database=Config.DB_NAME,
-      user=Config.DB_USER,
-      password=Config.DB_PASSWORD,
-      sslmode='require'
-    )
-  return pg_pool.getconn()
+  pool = pg_pool
+  if pool is not None and pool.pid == os.getpid():
+    return pool
+
+  with _pool_lock:
+    if pg_pool is not None and pg_pool.pid != os.getpid():
+      _orphaned_pools.append(pg_pool)
+      pg_pool = None
+    if pg_pool is None:
+      pg_pool = ConnectionPool(
+        minconn=Config.DB_POOL_MIN,
+        maxconn=Config.DB_POOL_MAX,
+        timeout=Config.DB_POOL_TIMEOUT,
+        max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+        idle_check=Config.DB_POOL_IDLE_CHECK,
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        database=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        sslmode=Config.DB_SSLMODE,
+        connect_timeout=Config.DB_CONNECT_TIMEOUT
+      )
+    return pg_pool
+
+def _reset_after_fork():
+  global pg_pool
+  if pg_pool is not None:
+    _orphaned_pools.append(pg_pool)
+    pg_pool = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def pool_stats():
+  return pg_pool.stats() if pg_pool is not None and pg_pool.pid == os.getpid() else None
+
+def get_db_connection():
+  return get_pool().getconn()
 
 def get_db():
   if 'db' not in g:
+    started = time.perf_counter()
     g.db = get_db_connection()
+    waited = time.perf_counter() - started
+    pool_wait.observe(waited)
+    add_timing('pool', waited, 1)
   return g.db
 
+def release_db_connection(conn):
+  if pg_pool is not None and pg_pool.pid == os.getpid():
+    pg_pool.putconn(conn)
+  else:
+    conn.close()
+
 def close_db(e=None):
   db = g.pop('db', None)
   if db is not None:
-    if pg_pool:
-      pg_pool.putconn(db)
-    else:
-      db.close()
+    release_db_connection(db)
 
 def init_app(app):
-  app.teardown_appcontext(close_db)
\ No newline at end of file
+  app.teardown_appcontext(close_db)
+  if app.config.get('DB_POOL_WARMUP'):
+    try:
+      get_pool().warm_up()
+    except Exception as e:
+      app.logger.warning('Database pool warm-up failed: %s', e)
@@ -0,0 +1,106 @@
+"""
+asyncpg access for the read endpoints app.asgi serves natively. The pool
+belongs to the event loop that opened it (uvicorn's, via the lifespan
+events); the Flask side keeps using the psycopg2 pool in app.db. Queries are
+written with %s placeholders like everywhere else and numbered on the way in.
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from app.config import Config
+from app.db import prepared
+from app.db.counts import estimated_rows
+from app.db.instrument import record
+from app.db.search import TRIGRAM_QUERY, set_trigram_available, trigram_check_due
+from app.metrics import add_timing, pool_wait
+
+try:
+  import asyncpg
+except ImportError:
+  asyncpg = None
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+async def _init_connection(conn):
+  # json comes back decoded, as psycopg2 returns it
+  for name in ('json', 'jsonb'):
+    await conn.set_type_codec(name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+async def open_pool():
+  """Returns the pool, creating it on first use."""
+  global _pool
+  if _pool is not None:
+    return _pool
+  if asyncpg is None:
+    raise RuntimeError('asyncpg is not installed')
+  async with _pool_lock:
+    if _pool is None:
+      _pool = await asyncpg.create_pool(
+        host=Config.DB_HOST,
+        port=int(Config.DB_PORT),
+        database=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        ssl=Config.DB_SSLMODE,
+        timeout=Config.DB_CONNECT_TIMEOUT,
+        min_size=Config.ASYNC_DB_POOL_MIN,
+        max_size=Config.ASYNC_DB_POOL_MAX,
+        max_inactive_connection_lifetime=Config.ASYNC_DB_POOL_IDLE_TIMEOUT,
+        # asyncpg prepares every statement itself; turned off like ours behind a pooler
+        statement_cache_size=256 if Config.DB_PREPARED_STATEMENTS else 0,
+        init=_init_connection
+      )
+  return _pool
+
+async def close_pool():
+  global _pool
+  pool, _pool = _pool, None
+  if pool is not None:
+    await pool.close()
+
+@asynccontextmanager
+async def connection():
+  """A pooled connection for one request; checkout time goes to pool_wait like get_db()."""
+  pool = await open_pool()
+  started = time.perf_counter()
+  async with pool.acquire(timeout=Config.DB_POOL_TIMEOUT) as conn:
+    waited = time.perf_counter() - started
+    pool_wait.observe(waited)
+    add_timing('pool', waited, 1)
+    yield conn
+
+async def fetch(conn, query, params=()):
+  """All rows of a query, timed and logged like the psycopg2 cursors."""
+  _, text, _ = prepared.compile_query(query)
+  rows = []
+  started = time.perf_counter()
+  try:
+    rows = await conn.fetch(text, *params)
+    return rows
+  finally:
+    record(query, params, len(rows), time.perf_counter() - started)
+
+async def fetchrow(conn, query, params=()):
+  rows = await fetch(conn, query, params)
+  return rows[0] if rows else None
+
+async def fetchval(conn, query, params=()):
+  row = await fetchrow(conn, query, params)
+  return row[0] if row is not None else None
+
+async def check_trigram(conn):
+  """Refreshes app.db.search's pg_trgm flag when due, so plans can be built without a cursor."""
+  if trigram_check_due():
+    set_trigram_available(await fetchval(conn, TRIGRAM_QUERY) is not None)
+
+async def fetch_list(conn, listing, page=1, per_page=10, search_term=None, search_mode='contains',
+                     sort_by=None, order='asc', cursor=None, count='exact', facets=False, **filters):
+  """ListQuery.fetch() on an asyncpg connection: same statement, caches and response."""
+  await check_trigram(conn)
+  plan = listing.plan(None, page, per_page, search_term, search_mode, sort_by, order, cursor, count, facets, **filters)
+  if plan['estimate']:
+    plan['total'] = estimated_rows(await fetchval(conn, *plan['estimate']))
+  row = await fetchrow(conn, plan['query'], plan['params'])
+  return listing.finish(plan, tuple(row))
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import uuid
+from app.db import get_db_connection, release_db_connection
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+class CopyStream:
+  """
+  File-like adapter that feeds an iterator of row tuples to COPY ... FROM STDIN
+  (FORMAT csv). Rows are rendered on demand, so only one read() worth of
+  text is held at a time. None becomes NULL.
+  """
+  def __init__(self, rows):
+    self._rows = iter(rows)
+    self._buffer = io.StringIO()
+    self._writer = csv.writer(self._buffer, lineterminator='\n')
+    self._pending = ''
+
+  def read(self, size=-1):
+    while size < 0 or len(self._pending) < size:
+      try:
+        row = next(self._rows)
+      except StopIteration:
+        break
+      self._writer.writerow(row)
+      self._pending += self._buffer.getvalue()
+      self._buffer.seek(0)
+      self._buffer.truncate()
+
+    if size < 0 or size >= len(self._pending):
+      chunk, self._pending = self._pending, ''
+    else:
+      chunk, self._pending = self._pending[:size], self._pending[size:]
+    return chunk
+
+  def readline(self, size=-1):
+    return self.read(size)
+
+def iter_query(query, params, batch_size=2000):
+  """
+  Yields result rows through a named (server-side) cursor, `batch_size` rows per fetch.
+  Uses its own pooled connection: a streamed body is still being read after
+  the request's connection has gone back to the pool.
+  """
+  conn = get_db_connection()
+  try:
+    cur = conn.cursor(name=f'stream_{uuid.uuid4().hex[:8]}')
+    cur.itersize = batch_size
+    try:
+      cur.execute(query, params)
+      yield from cur
+    finally:
+      cur.close()
+  finally:
+    release_db_connection(conn)
+
+def iter_records(stream, fmt):
+  """
+  Iterates (line_no, record, error) over a binary CSV (with header) or NDJSON stream.
+  Exactly one of record/error is set; malformed lines do not stop the read.
+  """
+  if fmt not in IMPORT_FORMATS:
+    raise ValueError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+  return _iter_csv(stream) if fmt == 'csv' else _iter_ndjson(stream)
+
+def _iter_csv(stream):
+  text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+  reader = csv.DictReader(text)
+  for record in reader:
+    yield reader.line_num, {k.strip().lower(): v for k, v in record.items() if k}, None
+
+def _iter_ndjson(stream):
+  text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+  for line_no, line in enumerate(text, start=1):
+    if not line.strip():
+      continue
+    try:
+      record = json.loads(line)
+    except ValueError as e:
+      yield line_no, None, f'Invalid JSON: {e}'
+      continue
+    if not isinstance(record, dict):
+      yield line_no, None, 'Each line must be a JSON object'
+      continue
+    yield line_no, {str(k).lower(): v for k, v in record.items()}, None
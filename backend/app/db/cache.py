@@ -0,0 +1,230 @@
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Writes to these tables can rewrite rows of the tables that reference them
+# (ON UPDATE CASCADE / ON DELETE SET NULL), so the dependents are bumped too.
+# app.db.migrations passes the same lists to the table_versions triggers.
+DEPENDENT_TABLES = {
+  'college': ('program',),
+  'program': ('student',),
+}
+VERSIONED_TABLES = ('college', 'program', 'student', 'users')
+
+CHANNEL = 'table_versions'
+# Seconds between full re-reads of table_versions (they also catch missed notifications)
+RESYNC_INTERVAL = 30
+RECONNECT_INTERVAL = 10
+
+class SharedVersions:
+  """
+  Change counters of the cached tables, shared by every process through
+  Postgres. Statement triggers bump a row of table_versions in the writing
+  transaction and NOTIFY its new value; each process LISTENs on a session of
+  its own and keeps the latest values in memory, so reading a version costs
+  nothing and workers agree on ETags and cache freshness.
+
+  bump() after a commit marks the table changed locally until the
+  notification arrives. Without the table (migration 5 not applied) or while
+  the listener is down, versions are local to the process and the epoch is a
+  per-process id, so nothing issued then matches another process's state.
+  """
+  def __init__(self):
+    self._shared = {}
+    self._pending = {}
+    self._epoch = uuid.uuid4().hex[:8]
+    self._listening = False
+    self._warned = False
+    self._pid = None
+    self._lock = threading.Lock()
+
+  def snapshot(self, tables):
+    self._ensure_listener()
+    with self._lock:
+      return (self._epoch,) + tuple(self._version(t) for t in tables)
+
+  def bump(self, table):
+    with self._lock:
+      for name in (table,) + DEPENDENT_TABLES.get(table, ()):
+        self._pending[name] = self._pending.get(name, 0) + 1
+
+  def stats(self):
+    return {'shared': self._listening and self._pid == os.getpid()}
+
+  def _version(self, table):
+    shared = self._shared.get(table, 0)
+    pending = self._pending.get(table)
+    return f'{shared}+{pending}' if pending else str(shared)
+
+  def _ensure_listener(self):
+    if self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      # A listener inherited across fork() belongs to the parent
+      self._pid = os.getpid()
+      self._listening = False
+      self._pending = {}
+      self._epoch = uuid.uuid4().hex[:8]
+    conn = self._connect()
+    threading.Thread(target=self._listen, args=(conn,), daemon=True, name='table-versions').start()
+
+  def _connect(self):
+    """A LISTENing session with the current versions loaded, or None if that is not possible."""
+    import psycopg2
+    from app.db import get_pool
+    conn = None
+    try:
+      # Outside the pool: the session must stay open to receive notifications
+      conn = psycopg2.connect(**get_pool().dsn)
+      conn.autocommit = True
+      with conn.cursor() as cur:
+        cur.execute(f'LISTEN {CHANNEL}')
+      self._resync(conn)
+      self._warned = False
+      return conn
+    except psycopg2.Error as e:
+      if conn is not None:
+        conn.close()
+      if not self._warned:
+        logger.warning('Table versions are local to this process until Postgres is reachable: %s', str(e).strip())
+        self._warned = True
+      return None
+
+  def _resync(self, conn):
+    with conn.cursor() as cur:
+      cur.execute('SELECT name, version FROM table_versions')
+      rows = cur.fetchall()
+    with self._lock:
+      if not self._listening:
+        # Values cached under the local epoch may have missed other processes' writes
+        self._epoch = 'db'
+      self._shared = dict(rows)
+      self._pending = {}
+      self._listening = True
+
+  def _listen(self, conn):
+    import psycopg2
+    resync_at = time.monotonic() + RESYNC_INTERVAL
+    while True:
+      if conn is None:
+        time.sleep(RECONNECT_INTERVAL)
+        conn = self._connect()
+        resync_at = time.monotonic() + RESYNC_INTERVAL
+        continue
+      try:
+        if select.select([conn], [], [], RECONNECT_INTERVAL)[0]:
+          conn.poll()
+          self._apply(conn.notifies)
+          conn.notifies.clear()
+        if time.monotonic() >= resync_at:
+          self._resync(conn)
+          resync_at = time.monotonic() + RESYNC_INTERVAL
+      except (psycopg2.Error, OSError) as e:
+        logger.warning('Lost the table versions listener: %s', str(e).strip())
+        with self._lock:
+          self._listening = False
+          self._epoch = uuid.uuid4().hex[:8]
+        conn.close()
+        conn = None
+
+  def _apply(self, notifies):
+    with self._lock:
+      for notify in notifies:
+        table, _, version = notify.payload.partition(':')
+        version = int(version)
+        if version > self._shared.get(table, 0):
+          self._shared[table] = version
+          self._pending.pop(table, None)
+
+_versions = SharedVersions()
+
+def table_version(table):
+  """Current change counter for a table."""
+  return _versions.snapshot((table,))
+
+def version_token(tables):
+  """Compact string that changes whenever any of the tables is written."""
+  epoch, *versions = _versions.snapshot(tables)
+  return epoch + ':' + '.'.join(versions)
+
+def bump(table):
+  """Marks a table (and its direct dependents) as changed. Call after commit."""
+  _versions.bump(table)
+
+def versions_stats():
+  return _versions.stats()
+
+_MISSING = object()
+_caches = {}
+
+def cache_stats():
+  """Hit/miss counters of every named cache, for the health endpoint."""
+  return {name: cache.stats() for name, cache in _caches.items()}
+
+class VersionedCache:
+  """
+  Bounded LRU cache tied to table versions.
+  Entries are ignored as soon as any of the tables they were built from changes
+  (in any process, see SharedVersions), or after `ttl` seconds as a safety net.
+  """
+  def __init__(self, *tables, max_entries=512, ttl=None, name=None):
+    self.tables = tables
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self._data = OrderedDict()
+    self._lock = threading.Lock()
+    if name:
+      _caches[name] = self
+
+  def version(self):
+    """Versions of the source tables; read it before loading a value to put()."""
+    return _versions.snapshot(self.tables)
+
+  def get(self, key, default=None):
+    """Returns the current value for `key`, or `default` if it is missing or stale."""
+    version = self.version()
+    with self._lock:
+      entry = self._data.get(key, _MISSING)
+      if entry is not _MISSING and entry[0] == version and (entry[1] is None or entry[1] > time.monotonic()):
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+      self.misses += 1
+    return default
+
+  def put(self, key, value, version):
+    """Stores a value built while the tables were at `version`."""
+    expires_at = time.monotonic() + self.ttl if self.ttl else None
+    with self._lock:
+      self._data[key] = (version, expires_at, value)
+      self._data.move_to_end(key)
+      while len(self._data) > self.max_entries:
+        self._data.popitem(last=False)
+
+  def get_or_load(self, key, loader):
+    version = self.version()
+    value = self.get(key, _MISSING)
+    if value is _MISSING:
+      # Load outside the lock; a write that lands meanwhile leaves this entry stale
+      value = loader()
+      self.put(key, value, version)
+    return value
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      'entries': len(self._data),
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': round(self.hits / lookups, 4) if lookups else None
+    }
@@ -0,0 +1,45 @@
+from app.config import Config
+from app.db.cache import VersionedCache
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+_exact_counts = {}
+
+def count_cache(table):
+  """Cache of exact counts for a table, keyed by filter_key()."""
+  if table not in _exact_counts:
+    _exact_counts[table] = VersionedCache(table, ttl=Config.COUNT_CACHE_TTL, name=f'{table}_counts')
+  return _exact_counts[table]
+
+def filter_key(filters):
+  """Normalizes a filter set so equivalent requests share a cache entry."""
+  key = []
+  for name, value in sorted(filters.items()):
+    if not value:
+      continue
+    if isinstance(value, str):
+      # Search is ILIKE, so case does not change the result
+      value = value.strip().lower()
+    elif isinstance(value, (list, tuple, set)):
+      value = tuple(sorted(set(map(str, value))))
+    key.append((name, value))
+  return tuple(key)
+
+def estimate_query(table, conditions, params):
+  """(sql, params) of the EXPLAIN whose row estimate stands in for a count."""
+  where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+  return f'EXPLAIN (FORMAT JSON) SELECT 1 FROM {table}{where}', params
+
+def estimated_rows(plan):
+  return int(plan[0]['Plan']['Plan Rows'])
+
+def add_totals(result, total, per_page, mode, paged=True):
+  """Adds total/total_pages to a list response unless counting was skipped."""
+  if total is None:
+    return result
+  result['total'] = total
+  if paged:
+    result['total_pages'] = (total + per_page - 1) // per_page
+  if mode == 'estimate':
+    result['total_estimated'] = True
+  return result
@@ -0,0 +1,88 @@
+import json
+
+# Sequential scans of tables at least this large (by the planner's row estimate) are flagged
+MIN_ROWS = 1000
+
+def _scans(plan, found):
+  """Collects (node type, relation, index) for every scan node in an EXPLAIN (FORMAT JSON) tree."""
+  if 'Relation Name' in plan:
+    found.append((plan['Node Type'], plan['Relation Name'], plan.get('Index Name')))
+  for child in plan.get('Plans', []):
+    _scans(child, found)
+  return found
+
+def _row_estimates(cur, tables):
+  cur.execute('SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s) AND relkind = %s', (list(tables), 'r'))
+  return {name: max(rows, 0) for name, rows in cur.fetchall()}
+
+def _sample(cur, table, column):
+  cur.execute(f'SELECT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT 1')
+  row = cur.fetchone()
+  return [str(row[0])] if row else None
+
+def list_shapes(cur, name, listing):
+  """
+  Yields (label, sql, params, reads_all) for the query shapes a model's get_all issues:
+  every sort and order, alone and under each filter, a keyset continuation,
+  contains/prefix search, relevance, the total count and the facet counts.
+  Filter values are sampled from the table so the planner sees real ones.
+  `reads_all` marks shapes that read every row by design (unfiltered counts).
+  """
+  samples = {f: _sample(cur, listing.table, f) for f in listing.filters if f in listing.facets}
+  filter_sets = [({}, '')] + [
+    ({f: value}, f' {f}={value[0]}') for f, value in samples.items() if value
+  ]
+  for filters, suffix in filter_sets:
+    for sort_by in sorted(listing.sort_columns):
+      for order in ('asc', 'desc'):
+        sql, params, *_ = listing.page_query(cur, sort_by=sort_by, order=order, **filters)
+        yield f'{name} sort={sort_by} {order}{suffix}', sql, params, False
+    sql, params = listing.count_query(**filters)
+    yield f'{name} count{suffix}', sql, params, not filters
+
+  # A cursor past the first page, taken from a real row
+  first = listing.fetch(cur, per_page=10, sort_by=listing.pk, cursor='', count='none')
+  if first.get('next_cursor'):
+    sql, params, *_ = listing.page_query(cur, sort_by=listing.pk, cursor=first['next_cursor'])
+    yield f'{name} cursor page 2', sql, params, False
+
+  term = 'ab'
+  for mode in ('contains', 'prefix'):
+    sql, params, *_ = listing.page_query(cur, search_term=term, search_mode=mode)
+    yield f'{name} search {mode}', sql, params, False
+  sql, params, *_ = listing.page_query(cur, search_term=term, sort_by='relevance')
+  yield f'{name} search relevance', sql, params, False
+
+  if listing.facets:
+    sql, params = listing.facet_query()
+    yield f'{name} facets', sql, params, True
+
+def explain_listings(conn, listings, min_rows=MIN_ROWS):
+  """
+  EXPLAINs (without running) every list query shape of `listings`
+  ({name: ListQuery}) and returns one dict per shape with its scans and
+  whether it sequentially scans a table of at least `min_rows` rows.
+  Unfiltered counts and facets read the whole table by design, so their
+  sequential scans are reported but not flagged.
+  """
+  results = []
+  with conn.cursor() as cur:
+    rows = _row_estimates(cur, [listing.table for listing in listings.values()])
+    for name, listing in listings.items():
+      for label, sql, params, reads_all in list_shapes(cur, name, listing):
+        cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+          plan = json.loads(plan)
+        plan = plan[0]['Plan']
+        scans = _scans(plan, [])
+        seq = sorted({relation for node, relation, _ in scans if node == 'Seq Scan'})
+        results.append({
+          'shape': label,
+          'cost': plan['Total Cost'],
+          'scans': [f'{node} on {relation}' + (f' using {index}' if index else '') for node, relation, index in scans],
+          'seq_scans': seq,
+          'flagged': not reads_all and any(rows.get(relation, 0) >= min_rows for relation in seq)
+        })
+  conn.rollback()
+  return results
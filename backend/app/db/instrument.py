@@ -0,0 +1,103 @@
+import sys
+import time
+import psycopg2.extensions
+from app.metrics import add_timing, current_endpoint, query_latency, query_rows
+from app.db import prepared
+from app.db.slowlog import slow_queries
+
+# Frames searched for the calling model method before giving up
+MAX_DEPTH = 25
+# Modules that only relay statements, never reported as their caller
+RELAYS = {__name__, 'app.db.aio'}
+
+def _caller():
+  """
+  The model method (e.g. Student.get_all) that issued the statement, or
+  else the nearest app function (e.g. ConnectionPool._usable for health checks).
+  """
+  fallback = None
+  frame = sys._getframe(2)
+  for _ in range(MAX_DEPTH):
+    if frame is None:
+      break
+    module = frame.f_globals.get('__name__', '')
+    if module.startswith('app.models.'):
+      return frame.f_code.co_qualname
+    if fallback is None and module.startswith('app.') and module not in RELAYS:
+      fallback = frame.f_code.co_qualname
+    frame = frame.f_back
+  return fallback or 'other'
+
+def _statement(query):
+  if isinstance(query, bytes):
+    query = query.decode(errors='replace')
+  elif not isinstance(query, str):
+    # psycopg2.sql.Composed and friends
+    return 'SQL'
+  words = query.lstrip(' \n\t(').split(None, 1)
+  return words[0].upper() if words else 'SQL'
+
+def _shape(query, statement):
+  """
+  Name of the query's shape: the statement name app.db.prepared gives it,
+  whether or not it ran prepared, so one caller's queries split by shape
+  and /api/metrics lines up with the slow query log and pg_prepared_statements.
+  """
+  if isinstance(query, bytes):
+    query = query.decode(errors='replace')
+  elif not isinstance(query, str):
+    return 'other'
+  if statement in ('PREPARE', 'EXECUTE'):
+    return query.split()[1].split('(')[0]
+  return prepared.compile_query(query)[0]
+
+def record(query, params, rows, elapsed):
+  """
+  Records one statement under its calling method, statement type and shape, feeding
+  /api/metrics and the request's Server-Timing `db` phase; slow ones also go
+  to the slow query log. Shared by the psycopg2 cursors and app.db.aio.
+  """
+  caller, statement = _caller(), _statement(query)
+  shape = _shape(query, statement)
+  query_latency.observe(elapsed, caller, statement, shape)
+  query_rows.observe(max(rows, 0), caller, statement, shape)
+  add_timing('db', elapsed, 1)
+  if slow_queries.enabled:
+    slow_queries.observe(rows, caller, statement, shape, query, params, elapsed, current_endpoint())
+
+class InstrumentedCursor:
+  """Cursor mixin that times every statement and passes it to record()."""
+  def _record(self, query, params, started):
+    record(query, params, self.rowcount, time.perf_counter() - started)
+
+  def execute(self, query, vars=None):
+    started = time.perf_counter()
+    try:
+      return super().execute(query, vars)
+    finally:
+      self._record(query, vars, started)
+
+  def executemany(self, query, vars_list):
+    started = time.perf_counter()
+    try:
+      return super().executemany(query, vars_list)
+    finally:
+      # Only the statement is logged for slow batches, not every row's parameters
+      self._record(query, None, started)
+
+  def copy_expert(self, sql, file, size=8192):
+    started = time.perf_counter()
+    try:
+      return super().copy_expert(sql, file, size)
+    finally:
+      self._record(sql, None, started)
+
+_classes = {}
+
+def instrumented(cursor_factory=None):
+  """The instrumented subclass of a cursor class (psycopg2's plain cursor by default)."""
+  factory = cursor_factory or psycopg2.extensions.cursor
+  cls = _classes.get(factory)
+  if cls is None:
+    cls = _classes[factory] = type(f'Instrumented{factory.__name__}', (InstrumentedCursor, factory), {})
+  return cls
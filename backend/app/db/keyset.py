@@ -0,0 +1,90 @@
+import base64
+import json
+
+def encode_cursor(sort_by, order, values, direction='next'):
+  """Packs the sort key of a boundary row into an opaque, URL-safe token."""
+  payload = {'s': sort_by, 'o': order, 'k': values, 'd': direction}
+  raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+  return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token, sort_by, order):
+  """Returns (values, direction) for a token issued for the same sort and order."""
+  try:
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    payload = json.loads(raw)
+    values, direction = payload['k'], payload['d']
+  except (ValueError, TypeError, KeyError):
+    raise ValueError('Invalid cursor')
+
+  if payload.get('s') != sort_by or payload.get('o') != order:
+    raise ValueError('Cursor does not match the requested sort_by/order')
+  if direction not in ('next', 'prev') or not isinstance(values, list):
+    raise ValueError('Invalid cursor')
+  return values, direction
+
+def seek_clause(sort_by, pk, descending, values):
+  """
+  Builds the WHERE fragment that resumes a scan after the given sort key.
+  Postgres sorts NULLs last in ascending order and first in descending order,
+  so nullable sort columns need an explicit branch for them.
+  """
+  if sort_by == pk:
+    return f'{pk} {"<" if descending else ">"} %s', [values[0]]
+
+  value, key = values
+  if descending:
+    if value is None:
+      return f'(({sort_by} IS NULL AND {pk} < %s) OR {sort_by} IS NOT NULL)', [key]
+    return f'({sort_by}, {pk}) < (%s, %s)', [value, key]
+
+  if value is None:
+    return f'({sort_by} IS NULL AND {pk} > %s)', [key]
+  return f'(({sort_by}, {pk}) > (%s, %s) OR {sort_by} IS NULL)', [value, key]
+
+def order_clause(sort_by, pk, descending):
+  """ORDER BY body with the primary key as a tiebreaker, so the order is total."""
+  direction = 'DESC' if descending else 'ASC'
+  if sort_by == pk:
+    return f'{pk} {direction}'
+  return f'{sort_by} {direction}, {pk} {direction}'
+
+def keyset_window(sort_by, pk, order, cursor):
+  """
+  Resolves a cursor into (condition, params, order_by, direction) for the page query.
+  An empty cursor starts from the first row and adds no condition.
+  Fetch one row more than the page size so page_cursors() can tell if more follow.
+  """
+  descending = order == 'desc'
+  if not cursor:
+    return None, [], order_clause(sort_by, pk, descending), 'next'
+
+  values, direction = decode_cursor(cursor, sort_by, order)
+  # Walking backwards is the same seek with the order flipped
+  flipped = descending != (direction == 'prev')
+  clause, params = seek_clause(sort_by, pk, flipped, values)
+  return clause, params, order_clause(sort_by, pk, flipped), direction
+
+def page_cursors(rows, sort_by, pk, order, per_page, cursor, direction):
+  """Trims the per_page + 1 fetched rows to a page; returns (rows, next_cursor, prev_cursor)."""
+  has_more = len(rows) > per_page
+  results = rows[:per_page]
+  if direction == 'prev':
+    results.reverse()
+
+  if not results:
+    return results, None, None
+
+  def key(row):
+    return [row[pk]] if sort_by == pk else [row[sort_by], row[pk]]
+
+  next_cursor = prev_cursor = None
+  if direction == 'next':
+    if has_more:
+      next_cursor = encode_cursor(sort_by, order, key(results[-1]), 'next')
+    if cursor:
+      prev_cursor = encode_cursor(sort_by, order, key(results[0]), 'prev')
+  else:
+    next_cursor = encode_cursor(sort_by, order, key(results[-1]), 'next')
+    if has_more:
+      prev_cursor = encode_cursor(sort_by, order, key(results[0]), 'prev')
+  return results, next_cursor, prev_cursor
@@ -0,0 +1,264 @@
+from app.db import prepared
+from app.db.counts import COUNT_MODES, count_cache, filter_key, add_totals, estimate_query, estimated_rows
+from app.db.keyset import keyset_window, page_cursors, order_clause
+from app.db.search import search_clause, rank_expression
+
+def any_of(column):
+  """Filter builder matching `column` against a list of values."""
+  def build(values):
+    return f'{column} = ANY(%s)', [values]
+  return build
+
+class ListQuery:
+  """
+  Paginated list query shared by the models. A model declares its table,
+  columns, primary key, sort whitelist, searchable fields and named filters
+  once; fetch() then serves offset and cursor pages, search and relevance
+  sorting for it. Filter builders take the request value and return a
+  (condition, params) pair, or None to skip the filter. `facets` names the
+  filters (each also a column) that can report per-value counts.
+  """
+  def __init__(self, table, columns, pk, sort_columns, search_fields, filters=None, facets=()):
+    self.table = table
+    self.columns = columns
+    self.pk = pk
+    self.sort_columns = sort_columns
+    self.search_fields = search_fields
+    self.filters = filters or {}
+    self.facets = facets
+
+  def _search(self, search_term, search_mode):
+    if not search_term:
+      return [], []
+    condition, params = search_clause(self.search_fields, search_term, search_mode)
+    return [condition], list(params)
+
+  def _filter_conditions(self, filters):
+    built = {}
+    for name, value in filters.items():
+      if value:
+        clause = self.filters[name](value)
+        if clause:
+          built[name] = clause
+    return built
+
+  def where(self, search_term=None, search_mode='contains', **filters):
+    """WHERE conditions and parameters for a search term and filter values."""
+    conditions, params = self._search(search_term, search_mode)
+    for condition, filter_params in self._filter_conditions(filters).values():
+      conditions.append(condition)
+      params.extend(filter_params)
+    return conditions, params
+
+  def facet_query(self, search_term=None, search_mode='contains', **filters):
+    """
+    One grouped scan that counts every value of each facet. A facet's counts
+    apply the search and all other active filters but not its own, so they
+    show what selecting another value would add. Returns (sql, params) for
+    a JSON array of [facet, value, count] triples.
+    """
+    built = self._filter_conditions(filters)
+    names, values, counts = [], [], []
+    params = []
+    for facet in self.facets:
+      others = [clause for name, clause in built.items() if name != facet]
+      names.append(f"WHEN GROUPING({facet}) = 0 THEN '{facet}'")
+      values.append(f'WHEN GROUPING({facet}) = 0 THEN to_jsonb({facet})')
+      if others:
+        counts.append(f'WHEN GROUPING({facet}) = 0 THEN COUNT(*) FILTER (WHERE {" AND ".join(c for c, _ in others)})')
+        for _, clause_params in others:
+          params.extend(clause_params)
+      else:
+        counts.append(f'WHEN GROUPING({facet}) = 0 THEN COUNT(*)')
+
+    conditions, search_params = self._search(search_term, search_mode)
+    params.extend(search_params)
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    grouped = (
+      f'SELECT CASE {" ".join(names)} END AS facet, CASE {" ".join(values)} END AS value, '
+      f'CASE {" ".join(counts)} END AS count '
+      f'FROM {self.table}{where} GROUP BY GROUPING SETS ({", ".join(f"({f})" for f in self.facets)})'
+    )
+    return f"SELECT COALESCE(json_agg(json_build_array(f.facet, f.value, f.count)), '[]') FROM ({grouped}) f", params
+
+  def _sort(self, sort_by):
+    return sort_by if sort_by in self.sort_columns else self.pk
+
+  def export_query(self, search_term=None, search_mode='contains', sort_by=None, order='asc', **filters):
+    """SELECT of every matching row in `columns` order, for streaming exports."""
+    conditions, params = self.where(search_term, search_mode, **filters)
+    query = f'SELECT {", ".join(self.columns)} FROM {self.table}'
+    if conditions:
+      query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {order_clause(self._sort(sort_by), self.pk, order.lower() == "desc")}'
+    return query, params
+
+  def count_query(self, search_term=None, search_mode='contains', **filters):
+    """(sql, params) counting every row that matches the search and filters."""
+    conditions, params = self.where(search_term, search_mode, **filters)
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return f'SELECT COUNT(*) FROM {self.table}{where}', params
+
+  def page_query(self, cur, page=1, per_page=10, search_term=None, search_mode='contains',
+                 sort_by=None, order='asc', cursor=None, **filters):
+    """
+    (sql, params, sort_by, order, direction, order_by) for one page of rows,
+    with the sort and order resolved against the whitelist. Cursor pages
+    fetch one row more than `per_page`; direction is None for offset pages.
+    order_by is the page's ORDER BY in terms of its own output columns, for
+    queries that select from it.
+    """
+    conditions, params = self.where(search_term, search_mode, **filters)
+    sort_order = 'desc' if order.lower() == 'desc' else 'asc'
+
+    columns = ', '.join(self.columns)
+    rank = None
+    if sort_by == 'relevance' and search_term:
+      if cursor is not None:
+        raise ValueError('sort_by=relevance does not support cursor pagination')
+      rank, rank_params = rank_expression(cur, self.search_fields, search_term)
+    sort_by = self._sort(sort_by)
+
+    direction = None
+    if cursor is not None:
+      seek, seek_params, order_by, direction = keyset_window(sort_by, self.pk, sort_order, cursor)
+      if seek:
+        conditions.append(seek)
+        params.extend(seek_params)
+      limit = ' LIMIT %s'
+      params.append(per_page + 1)
+    elif rank:
+      # Selected (its parameters first) so the order can be restated outside
+      columns += f', {rank} AS _rank'
+      params = rank_params + params
+      order_by = f'_rank DESC, {self.pk} ASC'
+      limit = ' LIMIT %s OFFSET %s'
+      params.extend([per_page, (page - 1) * per_page])
+    else:
+      order_by = order_clause(sort_by, self.pk, sort_order == 'desc')
+      limit = ' LIMIT %s OFFSET %s'
+      params.extend([per_page, (page - 1) * per_page])
+
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    query = f'SELECT {columns} FROM {self.table}{where} ORDER BY {order_by}{limit}'
+    return query, params, sort_by, sort_order, direction, order_by
+
+  def fetch(self, cur, page=1, per_page=10, search_term=None, search_mode='contains',
+            sort_by=None, order='asc', cursor=None, count='exact', facets=False, **filters):
+    """
+    Runs one list request and returns the response dict.
+    The page and its exact total come back from a single statement: the
+    total is a scalar subquery next to the page, which Postgres aggregates
+    into one JSON array, so the driver hands back ready-made dicts. A cached
+    total drops the count subquery; 'estimate' still needs its own EXPLAIN.
+    With `facets`, per-value facet counts join the same statement too.
+    """
+    plan = self.plan(cur, page, per_page, search_term, search_mode, sort_by, order, cursor, count, facets, **filters)
+    if plan['estimate']:
+      cur.execute(*plan['estimate'])
+      plan['total'] = estimated_rows(cur.fetchone()[0])
+    prepared.execute(cur, plan['query'], plan['params'])
+    return self.finish(plan, cur.fetchone())
+
+  def plan(self, cur, page=1, per_page=10, search_term=None, search_mode='contains',
+           sort_by=None, order='asc', cursor=None, count='exact', facets=False, **filters):
+    """
+    The driver-independent half of fetch(): a dict with the statement to run
+    ('query', 'params'), an EXPLAIN to run first for count=estimate
+    ('estimate', setting 'total'), and what finish() needs to build the
+    response from the statement's row. `cur` is only used to check for
+    pg_trgm and may be None once that is known (see app.db.aio).
+    """
+    if count not in COUNT_MODES:
+      raise ValueError(f"count must be one of: {', '.join(COUNT_MODES)}")
+
+    page_query, page_params, sort_by, sort_order, direction, order_by = self.page_query(
+      cur, page, per_page, search_term, search_mode, sort_by, order, cursor, **filters
+    )
+    plan = {
+      'page': page, 'per_page': per_page, 'cursor': cursor, 'count': count,
+      'sort_by': sort_by, 'order': sort_order, 'direction': direction,
+      'total': None, 'estimate': None, 'counting': None, 'facets': None, 'loading_facets': None
+    }
+
+    # Total: cached, estimated, skipped, or computed alongside the page
+    key = filter_key({'search': search_term, 'search_mode': search_term and search_mode, **filters})
+    if count == 'exact':
+      cache = count_cache(self.table)
+      version = cache.version()
+      plan['total'] = cache.get(key)
+      if plan['total'] is None:
+        plan['counting'] = (key, version)
+    elif count == 'estimate':
+      conditions, params = self.where(search_term, search_mode, **filters)
+      plan['estimate'] = estimate_query(self.table, conditions, params)
+
+    if facets and self.facets:
+      facet_cache = count_cache(self.table)
+      facet_key = ('facets',) + key
+      facet_version = facet_cache.version()
+      plan['facets'] = facet_cache.get(facet_key)
+      if plan['facets'] is None:
+        plan['loading_facets'] = (facet_key, facet_version)
+
+    # json_agg keeps its input order only when told; the subquery's ORDER BY is not enough
+    fields = ', '.join(f"'{column}', {column}" for column in self.columns)
+    query = f"SELECT (SELECT COALESCE(json_agg(json_build_object({fields}) ORDER BY {order_by}), '[]') FROM ({page_query}) p)"
+    if plan['counting']:
+      count_sql, count_params = self.count_query(search_term, search_mode, **filters)
+      query += f', ({count_sql})'
+      page_params.extend(count_params)
+    if plan['loading_facets']:
+      facet_sql, facet_params = self.facet_query(search_term, search_mode, **filters)
+      query += f', ({facet_sql})'
+      page_params.extend(facet_params)
+
+    plan['query'] = query
+    plan['params'] = page_params
+    return plan
+
+  def finish(self, plan, row):
+    """Response dict from the plan and the row its statement returned."""
+    rows = row[0]
+    total = plan['total']
+    facet_counts = plan['facets']
+    cache = count_cache(self.table)
+    if plan['counting']:
+      key, version = plan['counting']
+      total = row[1]
+      cache.put(key, total, version)
+    if plan['loading_facets']:
+      facet_key, facet_version = plan['loading_facets']
+      facet_counts = self._group_facets(row[-1])
+      cache.put(facet_key, facet_counts, facet_version)
+
+    per_page, count = plan['per_page'], plan['count']
+    if plan['cursor'] is not None:
+      rows, next_cursor, prev_cursor = page_cursors(
+        rows, plan['sort_by'], self.pk, plan['order'], per_page, plan['cursor'], plan['direction']
+      )
+      result = add_totals({
+        'data': rows,
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+      }, total, per_page, count, paged=False)
+    else:
+      result = add_totals({
+        'data': rows,
+        'page': plan['page'],
+        'per_page': per_page
+      }, total, per_page, count)
+
+    if facet_counts is not None:
+      result['facets'] = facet_counts
+    return result
+
+  def _group_facets(self, triples):
+    facets = {facet: [] for facet in self.facets}
+    for facet, value, count in triples:
+      facets[facet].append({'value': value, 'count': count})
+    for entries in facets.values():
+      # Missing values (NULL) sort last
+      entries.sort(key=lambda entry: (entry['value'] is None, entry['value']))
+    return facets
@@ -0,0 +1,215 @@
+"""
+Versioned schema for the tables the models query. Each migration runs once,
+in its own transaction, and is recorded in schema_migrations; `flask migrate`
+applies whatever is pending. Statements use IF NOT EXISTS so databases built
+by hand before this module existed adopt the managed schema in place.
+"""
+
+class Deferred(Exception):
+  """
+  Raised by a step whose prerequisite the database lacks. The migration is
+  rolled back and left pending, so a later `flask migrate` applies it; the
+  ones after it still run.
+  """
+
+# Arbitrary key for pg_advisory_xact_lock: concurrent `flask migrate` runs apply one at a time
+LOCK_KEY = 5_181_000
+
+CREATE_VERSION_TABLE = '''
+  CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+  )
+'''
+
+BASE_TABLES = [
+  '''CREATE TABLE IF NOT EXISTS college (
+    college_code VARCHAR(20) PRIMARY KEY,
+    college_name VARCHAR(100) NOT NULL
+  )''',
+  '''CREATE TABLE IF NOT EXISTS program (
+    program_code VARCHAR(20) PRIMARY KEY,
+    program_name VARCHAR(100) NOT NULL,
+    college_code VARCHAR(20) REFERENCES college (college_code) ON UPDATE CASCADE ON DELETE SET NULL
+  )''',
+  '''CREATE TABLE IF NOT EXISTS student (
+    student_id VARCHAR(9) PRIMARY KEY,
+    first_name VARCHAR(50) NOT NULL,
+    last_name VARCHAR(50) NOT NULL,
+    year_level INTEGER NOT NULL,
+    gender VARCHAR(20),
+    program_code VARCHAR(20) REFERENCES program (program_code) ON UPDATE CASCADE ON DELETE SET NULL,
+    photo_url TEXT
+  )''',
+  '''CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(80) UNIQUE NOT NULL,
+    email VARCHAR(120) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    google_id VARCHAR(255)
+  )''',
+  '''CREATE TABLE IF NOT EXISTS token_blocklist (
+    id SERIAL PRIMARY KEY,
+    jti VARCHAR(36) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+  )''',
+]
+
+# List pages sort by one whitelisted column with the primary key as tiebreaker
+# (ORDER BY col, pk), so every sort gets a (col, pk) index; Postgres walks it
+# forwards for asc and backwards for desc, and keyset cursors seek into it.
+# The program filter is the one the UI sets most, so its common sorts get a
+# composite too. Leading filter columns also serve the plain filters.
+LIST_INDEXES = [
+  'CREATE INDEX IF NOT EXISTS student_first_name_idx ON student (first_name, student_id)',
+  'CREATE INDEX IF NOT EXISTS student_last_name_idx ON student (last_name, student_id)',
+  'CREATE INDEX IF NOT EXISTS student_year_level_idx ON student (year_level, student_id)',
+  'CREATE INDEX IF NOT EXISTS student_gender_idx ON student (gender, student_id)',
+  # Also serves the ON UPDATE/DELETE actions of the program foreign key
+  'CREATE INDEX IF NOT EXISTS student_program_code_idx ON student (program_code, student_id)',
+  'CREATE INDEX IF NOT EXISTS student_program_last_name_idx ON student (program_code, last_name, student_id)',
+  'CREATE INDEX IF NOT EXISTS student_program_year_level_idx ON student (program_code, year_level, student_id)',
+  'CREATE INDEX IF NOT EXISTS program_name_idx ON program (program_name, program_code)',
+  'CREATE INDEX IF NOT EXISTS program_college_code_idx ON program (college_code, program_code)',
+  'CREATE INDEX IF NOT EXISTS college_name_idx ON college (college_name, college_code)',
+  # Logout/revocation lookups and the hourly cleanup
+  'CREATE INDEX IF NOT EXISTS token_blocklist_jti_idx ON token_blocklist (jti)',
+  'CREATE INDEX IF NOT EXISTS token_blocklist_created_at_idx ON token_blocklist (created_at)',
+  'ANALYZE college, program, student, token_blocklist',
+]
+
+def _search_indexes(cur):
+  from app.db.search import ensure_indexes
+  from app.models.college import College
+  from app.models.program import Program
+  from app.models.student import Student
+  created = ensure_indexes(cur, {
+    'college': College.SEARCH_FIELDS,
+    'program': Program.SEARCH_FIELDS,
+    'student': Student.SEARCH_FIELDS,
+  })
+  if created is None:
+    raise Deferred('pg_trgm is not available')
+
+def _enrollment_counts(cur):
+  from app.models.stats import CREATE_TABLE, CREATE_INDEX, CREATE_FUNCTION, CREATE_TRIGGERS, POPULATE
+  # Writes to student wait until the counts and their triggers are in place
+  cur.execute('LOCK TABLE student IN SHARE ROW EXCLUSIVE MODE')
+  cur.execute(CREATE_TABLE)
+  cur.execute(CREATE_INDEX)
+  cur.execute(CREATE_FUNCTION)
+  for statement in POPULATE + CREATE_TRIGGERS:
+    cur.execute(statement)
+
+# Bumps the written table and the dependents passed as trigger arguments, in
+# the writing transaction, and announces the new values to app.db.cache's
+# listeners; NOTIFY is delivered on commit and dropped on rollback.
+TABLE_VERSION_FUNCTION = '''
+  CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+  DECLARE
+    changed RECORD;
+  BEGIN
+    FOR changed IN
+      UPDATE table_versions SET version = version + 1
+      WHERE name = TG_TABLE_NAME OR name = ANY(TG_ARGV)
+      RETURNING name, version
+    LOOP
+      PERFORM pg_notify('table_versions', changed.name || ':' || changed.version);
+    END LOOP;
+    RETURN NULL;
+  END;
+  $$ LANGUAGE plpgsql
+'''
+
+def _table_versions(cur):
+  from app.db.cache import DEPENDENT_TABLES, VERSIONED_TABLES
+  cur.execute('''
+    CREATE TABLE IF NOT EXISTS table_versions (
+      name TEXT PRIMARY KEY,
+      version BIGINT NOT NULL DEFAULT 0
+    )
+  ''')
+  cur.execute(
+    'INSERT INTO table_versions (name) SELECT unnest(%s::text[]) ON CONFLICT DO NOTHING',
+    (list(VERSIONED_TABLES),)
+  )
+  cur.execute(TABLE_VERSION_FUNCTION)
+  for table in VERSIONED_TABLES:
+    # Trigger arguments are string literals; the table names are our own constants
+    dependents = ', '.join(f"'{name}'" for name in DEPENDENT_TABLES.get(table, ()))
+    cur.execute(f'DROP TRIGGER IF EXISTS {table}_version ON {table}')
+    cur.execute(f'''
+      CREATE TRIGGER {table}_version
+      AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+      FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version({dependents})
+    ''')
+
+# Status of background jobs (app.jobs), readable by every worker
+JOB_TABLES = [
+  '''CREATE TABLE IF NOT EXISTS jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    state JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ
+  )''',
+  # The hourly cleanup and the expiry check of polls
+  'CREATE INDEX IF NOT EXISTS jobs_expires_idx ON jobs ((COALESCE(finished_at, created_at)))',
+]
+
+# (version, name, steps); a step is SQL or a function of the cursor that may return a note
+MIGRATIONS = [
+  (1, 'base tables', BASE_TABLES),
+  (2, 'list sort and filter indexes', LIST_INDEXES),
+  (3, 'trigram search indexes', [_search_indexes]),
+  (4, 'enrollment counts', [_enrollment_counts]),
+  (5, 'shared table versions', [_table_versions]),
+  (6, 'job status table', JOB_TABLES),
+]
+
+def applied_versions(conn):
+  """{version: applied_at} of the migrations already in the database."""
+  with conn.cursor() as cur:
+    cur.execute(CREATE_VERSION_TABLE)
+    cur.execute('SELECT version, applied_at FROM schema_migrations')
+    versions = dict(cur.fetchall())
+  conn.commit()
+  return versions
+
+def migrate(conn, target=None):
+  """
+  Applies pending migrations up to `target` (default: all) in order.
+  Returns (applied, deferred): [(version, name, notes)] for the ones this
+  call applied and [(version, name, reason)] for the ones left pending.
+  """
+  applied_versions(conn)
+  applied, deferred = [], []
+  for version, name, steps in MIGRATIONS:
+    if target is not None and version > target:
+      break
+    try:
+      with conn.cursor() as cur:
+        cur.execute('SELECT pg_advisory_xact_lock(%s)', (LOCK_KEY,))
+        cur.execute('SELECT 1 FROM schema_migrations WHERE version = %s', (version,))
+        if cur.fetchone():
+          conn.commit()
+          continue
+        notes = []
+        for step in steps:
+          if callable(step):
+            note = step(cur)
+            if note:
+              notes.append(note)
+          else:
+            cur.execute(step)
+        cur.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (version, name))
+      conn.commit()
+    except Deferred as e:
+      conn.rollback()
+      deferred.append((version, name, str(e)))
+      continue
+    except Exception:
+      conn.rollback()
+      raise
+    applied.append((version, name, notes))
+  return applied, deferred
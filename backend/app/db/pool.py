@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+from app.db.instrument import instrumented
+
+class PooledConnection(psycopg2.extensions.connection):
+  """
+  Connection that remembers when it was opened and when it was last returned,
+  plus the statements prepared on its session (see app.db.prepared). Its
+  cursors are timed by app.db.instrument.
+  """
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.created_at = time.monotonic()
+    self.returned_at = self.created_at
+    self.prepared = OrderedDict()
+
+  def cursor(self, *args, **kwargs):
+    # Every cursor, whatever its factory, reports to app.metrics
+    kwargs['cursor_factory'] = instrumented(kwargs.get('cursor_factory') or self.cursor_factory)
+    return super().cursor(*args, **kwargs)
+
+class ConnectionPool:
+  """
+  Thread-safe pool with blocking checkout, health checks and lifetime recycling.
+  Checkouts wait up to `timeout` seconds for a free slot instead of failing
+  immediately. Connections older than `max_lifetime` are replaced, and ones
+  idle for longer than `idle_check` are pinged before being handed out.
+  """
+  def __init__(self, minconn, maxconn, timeout=10, max_lifetime=None, idle_check=None, **dsn):
+    self.minconn = minconn
+    self.maxconn = maxconn
+    self.timeout = timeout
+    self.max_lifetime = max_lifetime
+    self.idle_check = idle_check
+    self.dsn = dsn
+    self.pid = os.getpid()
+
+    self._idle = deque()
+    self._in_use = 0
+    self._slots = threading.BoundedSemaphore(maxconn)
+    self._lock = threading.Lock()
+
+    self._counters = {
+      'checkouts': 0, 'timeouts': 0, 'opened': 0, 'recycled': 0,
+      'failed_checks': 0, 'wait_total': 0.0, 'wait_max': 0.0
+    }
+    self._rate_mark = (time.monotonic(), 0)
+
+  def _connect(self):
+    conn = psycopg2.connect(connection_factory=PooledConnection, **self.dsn)
+    with self._lock:
+      self._counters['opened'] += 1
+    return conn
+
+  def warm_up(self):
+    """Opens connections until `minconn` are idle, so first requests skip the handshake."""
+    while True:
+      with self._lock:
+        if len(self._idle) + self._in_use >= self.minconn:
+          return
+      conn = self._connect()
+      with self._lock:
+        self._idle.append(conn)
+
+  def _usable(self, conn):
+    if conn.closed:
+      return False
+    now = time.monotonic()
+    if self.max_lifetime and now - conn.created_at > self.max_lifetime:
+      with self._lock:
+        self._counters['recycled'] += 1
+      return False
+    if self.idle_check is not None and now - conn.returned_at > self.idle_check:
+      try:
+        with conn.cursor() as cur:
+          cur.execute('SELECT 1')
+        conn.rollback()
+      except psycopg2.Error:
+        with self._lock:
+          self._counters['failed_checks'] += 1
+        return False
+    return True
+
+  def _discard(self, conn):
+    try:
+      conn.close()
+    except psycopg2.Error:
+      pass
+
+  def getconn(self):
+    started = time.monotonic()
+    if not self._slots.acquire(timeout=self.timeout):
+      with self._lock:
+        self._counters['timeouts'] += 1
+      raise PoolError(f'No database connection available after {self.timeout}s')
+    waited = time.monotonic() - started
+
+    try:
+      while True:
+        with self._lock:
+          # Most recently returned first: it is the least likely to be stale
+          conn = self._idle.pop() if self._idle else None
+        if conn is None:
+          conn = self._connect()
+          break
+        if self._usable(conn):
+          break
+        self._discard(conn)
+    except Exception:
+      self._slots.release()
+      raise
+
+    with self._lock:
+      self._in_use += 1
+      self._counters['checkouts'] += 1
+      self._counters['wait_total'] += waited
+      self._counters['wait_max'] = max(self._counters['wait_max'], waited)
+    return conn
+
+  def putconn(self, conn):
+    try:
+      if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        try:
+          conn.rollback()
+        except psycopg2.Error:
+          self._discard(conn)
+      with self._lock:
+        self._in_use -= 1
+        if not conn.closed:
+          conn.returned_at = time.monotonic()
+          self._idle.append(conn)
+    finally:
+      self._slots.release()
+
+  def stats(self):
+    now = time.monotonic()
+    with self._lock:
+      counters = dict(self._counters)
+      in_use, idle = self._in_use, len(self._idle)
+      mark_time, mark_checkouts = self._rate_mark
+      elapsed = now - mark_time
+      rate = (counters['checkouts'] - mark_checkouts) / elapsed if elapsed > 0 else 0.0
+      # Rate covers roughly the last minute
+      if elapsed > 60:
+        self._rate_mark = (now, counters['checkouts'])
+
+    checkouts = counters['checkouts']
+    return {
+      'min': self.minconn,
+      'max': self.maxconn,
+      'in_use': in_use,
+      'idle': idle,
+      'checkouts': checkouts,
+      'checkouts_per_sec': round(rate, 2),
+      'wait_ms_avg': round(counters['wait_total'] / checkouts * 1000, 3) if checkouts else 0.0,
+      'wait_ms_max': round(counters['wait_max'] * 1000, 3),
+      'timeouts': counters['timeouts'],
+      'opened': counters['opened'],
+      'recycled': counters['recycled'],
+      'failed_health_checks': counters['failed_checks']
+    }
@@ -0,0 +1,125 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import psycopg2
+from psycopg2 import errors
+from app.config import Config
+
+# Most statements a single connection keeps prepared before the oldest is deallocated
+MAX_PER_CONNECTION = 128
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+_unpreparable = set()
+_counters = {'executes': 0, 'prepares': 0, 'reprepares': 0, 'fallbacks': 0}
+_counters_lock = threading.Lock()
+
+def _count(name):
+  with _counters_lock:
+    _counters[name] += 1
+
+def compile_query(query):
+  """
+  Maps a query shape (its SQL text with %s placeholders) to a statement
+  name and the $n-numbered text PREPARE expects. The result is cached, so
+  each shape is translated once per process.
+  """
+  with _compiled_lock:
+    entry = _compiled.get(query)
+    if entry is not None:
+      _compiled.move_to_end(query)
+      return entry
+
+  position = 0
+  def number(match):
+    nonlocal position
+    if match.group() == '%%':
+      return '%'
+    position += 1
+    return f'${position}'
+
+  text = _PLACEHOLDER.sub(number, query)
+  name = 'ssis_' + hashlib.sha1(text.encode()).hexdigest()[:16]
+  entry = (name, text, position)
+  with _compiled_lock:
+    _compiled[query] = entry
+    while len(_compiled) > 1024:
+      _compiled.popitem(last=False)
+  return entry
+
+def execute(cur, query, params=()):
+  """
+  Runs a read-only query through a server-side prepared statement.
+  The statement is PREPAREd the first time a pooled connection sees the
+  shape and EXECUTEd afterwards, so Postgres parses and plans it once per
+  connection instead of once per request. Connections without a prepared
+  set (not from the pool), shapes Postgres cannot prepare and setups with
+  DB_PREPARED_STATEMENTS off (e.g. behind a transaction-mode pooler) fall
+  back to a plain execute.
+  """
+  prepared = getattr(cur.connection, 'prepared', None)
+  if prepared is None or not Config.DB_PREPARED_STATEMENTS or query in _unpreparable:
+    _count('fallbacks')
+    cur.execute(query, params)
+    return
+
+  name, text, arity = compile_query(query)
+  args = f'({", ".join(["%s"] * arity)})' if arity else ''
+  _count('executes')
+
+  if name not in prepared:
+    try:
+      _prepare(cur, prepared, name, text)
+    except (errors.IndeterminateDatatype, errors.AmbiguousParameter):
+      # Some parameter has no type Postgres can infer; run this shape unprepared
+      cur.connection.rollback()
+      _unpreparable.add(query)
+      _count('fallbacks')
+      cur.execute(query, params)
+      return
+  else:
+    prepared.move_to_end(name)
+
+  try:
+    cur.execute(f'EXECUTE {name}{args}', params)
+  except errors.InvalidSqlStatementName:
+    # The session lost its statements (e.g. DISCARD ALL); prepare again.
+    # Only read queries come through here, so the rollback loses no work.
+    cur.connection.rollback()
+    prepared.clear()
+    _count('reprepares')
+    _prepare(cur, prepared, name, text)
+    cur.execute(f'EXECUTE {name}{args}', params)
+
+def _prepare(cur, prepared, name, text):
+  cur.execute(f'PREPARE {name} AS {text}')
+  prepared[name] = text
+  _count('prepares')
+  while len(prepared) > MAX_PER_CONNECTION:
+    oldest, _ = prepared.popitem(last=False)
+    cur.execute(f'DEALLOCATE {oldest}')
+
+def source_query(name):
+  """The %s-style query a statement name was compiled from, if still cached."""
+  with _compiled_lock:
+    for query, entry in _compiled.items():
+      if entry[0] == name:
+        return query
+  return None
+
+def prepared_stats():
+  """Execute/prepare counters; hit_rate is the share of executes that skipped PREPARE."""
+  with _counters_lock:
+    counters = dict(_counters)
+  executes = counters['executes']
+  return {
+    'shapes': len(_compiled),
+    'executes': executes,
+    'prepares': counters['prepares'],
+    'reprepares': counters['reprepares'],
+    'fallbacks': counters['fallbacks'],
+    'hit_rate': round((executes - counters['prepares']) / executes, 4) if executes else None
+  }
@@ -0,0 +1,82 @@
+import time
+import psycopg2
+
+SEARCH_MODES = ('contains', 'prefix')
+
+# Re-check a missing extension every few minutes so a `flask migrate` that
+# installs it takes effect without restarting the server.
+TRIGRAM_RECHECK_SECONDS = 300
+
+_trigram = {'available': False, 'checked_at': None}
+
+TRIGRAM_QUERY = "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+
+def trigram_check_due():
+  checked_at = _trigram['checked_at']
+  return not (_trigram['available'] or (checked_at and time.monotonic() - checked_at < TRIGRAM_RECHECK_SECONDS))
+
+def set_trigram_available(available):
+  _trigram['available'] = available
+  _trigram['checked_at'] = time.monotonic()
+
+def trigram_available(cur):
+  """
+  Whether pg_trgm is installed, so ILIKE can use the trigram indexes and ranking.
+  With `cur` None the last known answer is returned without checking.
+  """
+  if cur is not None and trigram_check_due():
+    cur.execute(TRIGRAM_QUERY)
+    set_trigram_available(cur.fetchone() is not None)
+  return _trigram['available']
+
+def _escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_clause(fields, term, mode='contains'):
+  """
+  Returns (condition, params) matching `term` as a substring (or prefix) of
+  any of `fields`. With pg_trgm GIN indexes on the fields Postgres answers
+  this with a bitmap index scan; without them it is the old sequential ILIKE.
+  """
+  if mode not in SEARCH_MODES:
+    raise ValueError(f"search_mode must be one of: {', '.join(SEARCH_MODES)}")
+  escaped = _escape_like(term.strip())
+  pattern = f'{escaped}%' if mode == 'prefix' else f'%{escaped}%'
+  condition = '(' + ' OR '.join(f'{field} ILIKE %s' for field in fields) + ')'
+  return condition, [pattern] * len(fields)
+
+def rank_expression(cur, fields, term):
+  """
+  Returns (expression, params) scoring how well a row matches `term`, higher is better.
+  Uses trigram word similarity when available, otherwise counts prefix matches.
+  """
+  term = term.strip()
+  if trigram_available(cur):
+    parts = [f'word_similarity(%s, {field})' for field in fields]
+    return f'COALESCE(GREATEST({", ".join(parts)}), 0)', [term] * len(fields)
+  parts = [f'COALESCE({field} ILIKE %s, false)::int' for field in fields]
+  return '(' + ' + '.join(parts) + ')', [f'{_escape_like(term)}%'] * len(fields)
+
+def ensure_indexes(cur, tables):
+  """
+  Installs pg_trgm and a trigram GIN index per searchable column, in the
+  caller's transaction. `tables` maps table name to its searchable fields.
+  Returns the index names, or None when the extension cannot be installed
+  (searches keep using ILIKE); the transaction stays usable either way.
+  """
+  cur.execute('SAVEPOINT pg_trgm')
+  try:
+    cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+  except psycopg2.Error:
+    cur.execute('ROLLBACK TO SAVEPOINT pg_trgm')
+    return None
+  cur.execute('RELEASE SAVEPOINT pg_trgm')
+
+  created = []
+  for table, fields in tables.items():
+    for field in fields:
+      name = f'{table}_{field}_trgm_idx'
+      cur.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({field} gin_trgm_ops)')
+      created.append(name)
+  _trigram['checked_at'] = None
+  return created
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+import psycopg2
+from app.config import Config
+from app.db import prepared
+
+logger = logging.getLogger(__name__)
+
+# EXPLAIN ANALYZE executes the statement, so only reads are sampled, and
+# each runs in a READ ONLY transaction that a data-modifying CTE (or a
+# function that writes) fails in rather than persisting anything
+EXPLAINABLE = ('SELECT', 'WITH')
+# Row locks are refused in a read-only transaction; do not try
+LOCKING = re.compile(r'\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.IGNORECASE)
+EXPLAIN_TIMEOUT_MS = 30000
+FILE_MAX_BYTES = 5 * 1024 * 1024
+
+def normalize(sql):
+  return ' '.join(sql.split())
+
+def param_shape(value):
+  """Type and size of a bound parameter, without its value."""
+  if value is None:
+    return 'null'
+  if isinstance(value, (list, tuple)):
+    inner = sorted({type(item).__name__ for item in value}) or ['?']
+    return f'{type(value).__name__}[{"|".join(inner)}]({len(value)})'
+  if isinstance(value, (str, bytes)):
+    return f'{type(value).__name__}({len(value)})'
+  return type(value).__name__
+
+class SlowQueryLog:
+  """
+  Keeps the last `size` statements slower than `threshold_ms` in memory and
+  appends them to `path` as JSON lines. SQL is logged with its placeholders
+  and parameters only by type and size. A `sample_rate` share of slow reads
+  is re-run under EXPLAIN (ANALYZE, BUFFERS) by one background thread on its
+  own connection, and the plan is attached to the entry.
+  """
+  def __init__(self, threshold_ms, sample_rate, size, path=None):
+    self.threshold = threshold_ms / 1000
+    self.sample_rate = sample_rate
+    self.path = path
+    self._entries = deque(maxlen=size)
+    self._lock = threading.Lock()
+    self._queue = None
+    self._pid = None
+    self._file = None
+
+  @property
+  def enabled(self):
+    return self.threshold > 0
+
+  def observe(self, rows, caller, statement, shape, query, params, elapsed, endpoint=None):
+    """Called for every statement; records it if it crossed the threshold."""
+    if elapsed < self.threshold:
+      return
+    sql = query if isinstance(query, str) else query.decode(errors='replace') if isinstance(query, bytes) else str(query)
+    if statement == 'EXECUTE':
+      # A prepared statement: log (and explain) the query it was prepared from
+      source = prepared.source_query(sql.split()[1].split('(')[0])
+      if source is not None:
+        sql = source
+    if isinstance(params, dict):
+      shapes = {name: param_shape(value) for name, value in params.items()}
+    else:
+      shapes = [param_shape(value) for value in params or ()]
+
+    entry = {
+      'at': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+      'caller': caller,
+      'endpoint': endpoint,
+      'statement': statement,
+      'shape': shape,
+      'duration_ms': round(elapsed * 1000, 2),
+      'rows': rows,
+      'sql': normalize(sql),
+      'params': shapes,
+      'plan': None
+    }
+    with self._lock:
+      self._entries.append(entry)
+    logger.warning('Slow query (%.1f ms) in %s: %s', entry['duration_ms'], caller, entry['sql'])
+
+    explain = (sql.lstrip(' \n\t(').split(None, 1)[0].upper() in EXPLAINABLE
+               and not LOCKING.search(sql)
+               and random.random() < self.sample_rate)
+    if not explain or not self._enqueue(entry, sql, params):
+      self._write(entry)
+
+  def entries(self, limit=None):
+    """Most recent first."""
+    with self._lock:
+      entries = list(self._entries)
+    entries.reverse()
+    return entries[:limit] if limit else entries
+
+  def _enqueue(self, entry, sql, params):
+    if self._pid != os.getpid():
+      with self._lock:
+        if self._pid != os.getpid():
+          self._queue = queue.Queue(maxsize=8)
+          self._pid = os.getpid()
+          self._file = None
+          threading.Thread(target=self._explain_worker, name='slow-query-explain', daemon=True).start()
+    try:
+      self._queue.put_nowait((entry, sql, params))
+      return True
+    except queue.Full:
+      return False
+
+  def _explain_worker(self):
+    conn = None
+    while True:
+      entry, sql, params = self._queue.get()
+      try:
+        if conn is None or conn.closed:
+          conn = self._connect()
+        with conn.cursor() as cur:
+          cur.execute('SET TRANSACTION READ ONLY')
+          cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+          entry['plan'] = cur.fetchone()[0]
+      except Exception as e:
+        entry['plan_error'] = ' '.join(str(e).split())
+      finally:
+        if conn is not None and not conn.closed:
+          try:
+            # Nothing here persists either way
+            conn.rollback()
+          except psycopg2.Error:
+            conn.close()
+      self._write(entry)
+
+  def _connect(self):
+    from app.db import get_pool
+    # Outside the pool: plain cursors, so its own statements are not timed or logged
+    conn = psycopg2.connect(**get_pool().dsn)
+    with conn.cursor() as cur:
+      cur.execute('SET statement_timeout = %s', (EXPLAIN_TIMEOUT_MS,))
+    conn.commit()
+    return conn
+
+  def _write(self, entry):
+    if not self.path:
+      return
+    with self._lock:
+      if self._file is None:
+        self._file = RotatingFileHandler(self.path, maxBytes=FILE_MAX_BYTES, backupCount=1, encoding='utf-8')
+        self._file.setFormatter(logging.Formatter('%(message)s'))
+    self._file.handle(logging.makeLogRecord({'msg': json.dumps(entry, default=str)}))
+
+def read_file(path, limit=None):
+  """Entries from a slow query file (and its rotated predecessor), most recent first."""
+  entries = []
+  for name in (path + '.1', path):
+    if os.path.exists(name):
+      with open(name, encoding='utf-8') as f:
+        entries.extend(json.loads(line) for line in f if line.strip())
+  entries.reverse()
+  return entries[:limit] if limit else entries
+
+slow_queries = SlowQueryLog(
+  Config.SLOW_QUERY_MS, Config.SLOW_QUERY_EXPLAIN_RATE, Config.SLOW_QUERY_BUFFER, Config.SLOW_QUERY_FILE
+)
@@ -0,0 +1,183 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from psycopg2 import Error as DatabaseError
+from psycopg2.extras import Json
+from app.db import get_db
+
+logger = logging.getLogger(__name__)
+
+# Written on every status change so any worker can answer a poll (migration 6)
+SAVE_JOB = '''
+  INSERT INTO jobs (id, state, created_at, finished_at)
+  VALUES (%s, %s, to_timestamp(%s), to_timestamp(%s))
+  ON CONFLICT (id) DO UPDATE SET state = EXCLUDED.state, finished_at = EXCLUDED.finished_at
+'''
+# The queued state must not overwrite a status the worker already saved
+INSERT_JOB = SAVE_JOB.split(' ON CONFLICT', 1)[0] + ' ON CONFLICT (id) DO NOTHING'
+
+class QueueFull(Exception):
+  """Raised when a job is submitted while the queue is at capacity."""
+
+class JobQueue:
+  """
+  Bounded queue drained by a few daemon worker threads.
+  Each job runs inside an app context. Its status is kept in memory for
+  `retention` seconds after it finishes, so it can be polled by id, and
+  saved to the jobs table, so a poll that lands on another worker finds it
+  too. If the table cannot be written, status is only known in this process.
+  """
+  def __init__(self, workers=2, max_pending=32, retention=3600, max_jobs=1000):
+    self.workers = workers
+    self.max_pending = max_pending
+    self.retention = retention
+    self.max_jobs = max_jobs
+    self.app = None
+    self._queue = None
+    self._pid = None
+    self._warned = False
+    self._jobs = OrderedDict()
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    self.app = app
+    self.workers = app.config.get('UPLOAD_WORKERS', self.workers)
+    self.max_pending = app.config.get('UPLOAD_QUEUE_SIZE', self.max_pending)
+
+  def _ensure_workers(self):
+    # Threads do not survive fork(), so each process starts its own on first use
+    if self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      self._queue = queue.Queue(self.max_pending)
+      for i in range(self.workers):
+        threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+      self._pid = os.getpid()
+
+  def submit(self, fn, *args, **meta):
+    """
+    Queues fn(*args) and returns the job id. The function's return value
+    becomes the job's `result`; an exception marks the job failed with its
+    message. `meta` is stored on the job as-is.
+    """
+    self._ensure_workers()
+    job = {'id': uuid.uuid4().hex, 'status': 'queued', 'created_at': time.time(), **meta}
+    with self._lock:
+      try:
+        self._queue.put_nowait((job, fn, args))
+      except queue.Full:
+        raise QueueFull('Too many pending jobs, try again shortly')
+      self._jobs[job['id']] = job
+      self._prune()
+      state = dict(job)
+    self._save(INSERT_JOB, state)
+    return job['id']
+
+  def get(self, job_id):
+    """A copy of the job's current state, or None if unknown or expired."""
+    with self._lock:
+      job = self._jobs.get(job_id)
+      if job:
+        return dict(job)
+    return self._load(job_id)
+
+  def stats(self):
+    with self._lock:
+      statuses = [job['status'] for job in self._jobs.values()]
+    return {
+      'pending': self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+      'max_pending': self.max_pending,
+      'running': statuses.count('running'),
+      'failed': statuses.count('failed'),
+      'done': statuses.count('done')
+    }
+
+  def cleanup(self):
+    """Deletes saved jobs older than `retention`; returns how many."""
+    conn = get_db()
+    try:
+      with conn.cursor() as cur:
+        cur.execute(
+          "DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < NOW() - make_interval(secs => %s)",
+          (self.retention,)
+        )
+        deleted = cur.rowcount
+      conn.commit()
+      return deleted
+    except DatabaseError:
+      conn.rollback()
+      return 0
+
+  def _prune(self):
+    cutoff = time.time() - self.retention
+    for job_id, job in list(self._jobs.items()):
+      finished_at = job.get('finished_at')
+      if finished_at is not None and (finished_at < cutoff or len(self._jobs) > self.max_jobs):
+        del self._jobs[job_id]
+
+  def _update(self, job, **fields):
+    with self._lock:
+      job.update(fields)
+      state = dict(job)
+    self._save(SAVE_JOB, state)
+
+  def _save(self, query, state):
+    conn = None
+    try:
+      conn = get_db()
+      with conn.cursor() as cur:
+        cur.execute(query, (state['id'], Json(state), state['created_at'], state.get('finished_at')))
+      conn.commit()
+    except Exception as e:
+      # Best effort: the job itself goes on, and this process still answers for it
+      if conn is not None and not conn.closed:
+        conn.rollback()
+      if not self._warned:
+        logger.warning('Job status is only kept in this process: %s', str(e).strip())
+        self._warned = True
+
+  def _load(self, job_id):
+    conn = None
+    try:
+      conn = get_db()
+      with conn.cursor() as cur:
+        cur.execute(
+          "SELECT state FROM jobs WHERE id = %s AND COALESCE(finished_at, created_at) >= NOW() - make_interval(secs => %s)",
+          (job_id, self.retention)
+        )
+        row = cur.fetchone()
+      conn.commit()
+    except Exception:
+      if conn is not None and not conn.closed:
+        conn.rollback()
+      return None
+    return row[0] if row else None
+
+  def _work(self):
+    # Status writes and the job each get their own app context, so a pooled
+    # connection is held only while one of them is using it: the job takes
+    # one (get_db) for its final write, not for the whole render and upload.
+    while True:
+      job, fn, args = self._queue.get()
+      try:
+        with self.app.app_context():
+          self._update(job, status='running', started_at=time.time())
+        try:
+          with self.app.app_context():
+            result = fn(*args)
+        except Exception as e:
+          outcome = {'status': 'failed', 'error': str(e)}
+        else:
+          outcome = {'status': 'done', 'result': result}
+        with self.app.app_context():
+          self._update(job, finished_at=time.time(), **outcome)
+      finally:
+        self._queue.task_done()
+
+photo_jobs = JobQueue()
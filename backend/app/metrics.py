@@ -0,0 +1,170 @@
+import hmac
+import threading
+import time
+from contextvars import ContextVar
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, jsonify, request
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+class Histogram:
+  """
+  Prometheus-style histogram kept in this process: per label set, a count
+  per bucket plus the sum and total. Each worker process exposes its own.
+  """
+  def __init__(self, name, help, labels, buckets):
+    self.name = name
+    self.help = help
+    self.labels = labels
+    self.buckets = buckets
+    self._series = {}
+    self._lock = threading.Lock()
+
+  def observe(self, value, *label_values):
+    index = bisect_left(self.buckets, value)
+    with self._lock:
+      series = self._series.get(label_values)
+      if series is None:
+        series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+      series[0][index] += 1
+      series[1] += value
+      series[2] += 1
+
+  def render(self):
+    lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+    with self._lock:
+      series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+    for label_values, (counts, total, count) in sorted(series.items()):
+      labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+      prefix = labels + ',' if labels else ''
+      cumulative = 0
+      for bound, bucket in zip(self.buckets, counts):
+        cumulative += bucket
+        lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+      lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+      suffix = f'{{{labels}}}' if labels else ''
+      lines.append(f'{self.name}_sum{suffix} {total}')
+      lines.append(f'{self.name}_count{suffix} {count}')
+    return lines
+
+def _escape(value):
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_latency = Histogram(
+  'ssis_request_duration_seconds', 'Time spent in the view, per endpoint.',
+  ('endpoint', 'method', 'status'), REQUEST_BUCKETS
+)
+query_latency = Histogram(
+  'ssis_db_query_duration_seconds', 'Statement execution time, per calling method, statement type and query shape.',
+  ('caller', 'statement', 'shape'), QUERY_BUCKETS
+)
+query_rows = Histogram(
+  'ssis_db_query_rows', 'Rows returned or affected per statement.',
+  ('caller', 'statement', 'shape'), ROW_BUCKETS
+)
+pool_wait = Histogram(
+  'ssis_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.',
+  (), QUERY_BUCKETS
+)
+HISTOGRAMS = (request_latency, query_latency, query_rows, pool_wait)
+
+# Requests served natively by app.asgi have no Flask request context; they
+# keep {'endpoint': ..., 'timings': {...}} here instead
+async_request = ContextVar('async_request', default=None)
+
+def _current_timings():
+  if has_request_context():
+    timings = g.get('_timings')
+    if timings is None:
+      timings = g._timings = {}
+    return timings
+  state = async_request.get()
+  return state['timings'] if state is not None else None
+
+def current_endpoint():
+  """Endpoint of the request being served, in Flask or app.asgi, if any."""
+  if has_request_context():
+    return request.endpoint
+  state = async_request.get()
+  return state['endpoint'] if state is not None else None
+
+def add_timing(phase, seconds, count=0):
+  """Adds time (and a count, e.g. of queries) to a phase of the current request's Server-Timing."""
+  timings = _current_timings()
+  if timings is None:
+    return
+  entry = timings.setdefault(phase, [0.0, 0])
+  entry[0] += seconds
+  entry[1] += count
+
+@contextmanager
+def timed(phase):
+  started = time.perf_counter()
+  try:
+    yield
+  finally:
+    add_timing(phase, time.perf_counter() - started, 1)
+
+# Server-Timing descriptions of the phase counts
+PHASE_COUNTS = {'db': ('query', 'queries')}
+
+def server_timing(total, timings):
+  parts = [f'total;dur={total * 1000:.2f}']
+  for phase, (seconds, count) in timings.items():
+    part = f'{phase};dur={seconds * 1000:.2f}'
+    if phase in PHASE_COUNTS:
+      singular, plural = PHASE_COUNTS[phase]
+      part += f';desc="{count} {singular if count == 1 else plural}"'
+    parts.append(part)
+  return ', '.join(parts)
+
+def render():
+  """Every histogram in the Prometheus text exposition format."""
+  lines = []
+  for histogram in HISTOGRAMS:
+    lines.extend(histogram.render())
+  return '\n'.join(lines) + '\n'
+
+def bearer_matches(token):
+  """Whether the request sends `Authorization: Bearer <token>`, compared in constant time."""
+  supplied = request.headers.get('Authorization', '')
+  return hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
+def init_app(app):
+  """
+  Times every request, adds a Server-Timing header (total, db, pool, auth)
+  when SERVER_TIMING is on, and serves /api/metrics behind a bearer token
+  when METRICS_TOKEN is set (the same token guards /api/admin). Both are off
+  by default: the header and the endpoint describe the database to whoever
+  can read them. Streamed bodies
+  are timed up to the view's return.
+  """
+  timing_enabled = app.config.get('SERVER_TIMING')
+  token = app.config.get('METRICS_TOKEN')
+
+  @app.before_request
+  def start_timer():
+    g._started = time.perf_counter()
+
+  @app.after_request
+  def record_timing(response):
+    started = g.get('_started')
+    if started is None:
+      return response
+    total = time.perf_counter() - started
+    request_latency.observe(total, request.endpoint or 'unmatched', request.method, response.status_code)
+    if timing_enabled:
+      response.headers['Server-Timing'] = server_timing(total, g.get('_timings') or {})
+    return response
+
+  if not token:
+    return
+
+  @app.route('/api/metrics', methods=['GET'])
+  def metrics():
+    if not bearer_matches(token):
+      return jsonify({'error': 'Invalid metrics token'}), 401
+    return Response(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,56 +1,60 @@
-from app.db import get_db
+from app.db import aio, get_db
+from app.config import Config
+from app.db.bulk import iter_query
+from app.db.cache import VersionedCache, bump
+from app.db.listing import ListQuery
+
+# Dropdown reference data changes rarely, so it is kept in memory between writes
+_reference = VersionedCache('college', ttl=Config.REFERENCE_CACHE_TTL, name='college_reference')
 
 class College:
+  COLUMNS = ('college_code', 'college_name')
+  SORT_COLUMNS = {'college_code', 'college_name'}
+  SEARCH_FIELDS = ('college_code', 'college_name')
+  LISTING = ListQuery('college', COLUMNS, 'college_code', SORT_COLUMNS, SEARCH_FIELDS)
+
   @staticmethod
-  def get_all(page=1, per_page=10, search_term=None, only_codes=False, sort_by='college_code', order='asc'):
+  def get_all(page=1, per_page=10, search_term=None, only_codes=False, sort_by='college_code', order='asc', cursor=None, count='exact', search_mode='contains'):
+    if only_codes:
+      return {'data': College.get_codes()}
+
     conn = get_db()
-    cur = conn.cursor()
+    with conn.cursor() as cur:
+      return College.LISTING.fetch(
+        cur, page, per_page, search_term, search_mode, sort_by, order, cursor, count
+      )
 
-    if only_codes:
-        cur.execute('SELECT college_code FROM college ORDER BY college_code ASC')
-        results = [row[0] for row in cur.fetchall()]
-        cur.close()
-        return {'data': results}
+  @staticmethod
+  async def get_all_async(conn, page=1, per_page=10, search_term=None, sort_by='college_code', order='asc', cursor=None, count='exact', search_mode='contains'):
+    """get_all() on an asyncpg connection (see app.db.aio); only_codes stays on the sync path."""
+    return await aio.fetch_list(
+      conn, College.LISTING, page, per_page, search_term, search_mode, sort_by, order, cursor, count
+    )
 
-    query = 'SELECT college_code, college_name FROM college'
-    count_query = 'SELECT COUNT(*) FROM college'
-    
-    params = []
-    if search_term:
-      where_clause = ' WHERE college_code ILIKE %s OR college_name ILIKE %s'
-      query += where_clause
-      count_query += where_clause
-      term = f'%{search_term}%'
-      params.extend([term, term])
-    
-    # Get total count
-    cur.execute(count_query, params)
-    total_count = cur.fetchone()[0]
+  @staticmethod
+  def export_rows(search_term=None, sort_by='college_code', order='asc', search_mode='contains', batch_size=2000):
+    """Iterates every matching row as a tuple in COLUMNS order, one server-side batch at a time."""
+    query, params = College.LISTING.export_query(search_term, search_mode, sort_by, order)
+    return iter_query(query, params, batch_size)
+
+  @staticmethod
+  def get_codes():
+    """All college codes in order, without a database round trip when cached."""
+    return College._reference()['codes']
 
-    # Sorting
-    valid_sort_columns = {'college_code', 'college_name'}
-    if sort_by not in valid_sort_columns:
-        sort_by = 'college_code'
-    
-    sort_order = 'DESC' if order.lower() == 'desc' else 'ASC'
-    query += f' ORDER BY {sort_by} {sort_order} LIMIT %s OFFSET %s'
-    
-    offset = (page - 1) * per_page
-    params.extend([per_page, offset])
-    
-    cur.execute(query, params)
-    columns = [desc[0] for desc in cur.description]
-    results = [dict(zip(columns, row)) for row in cur.fetchall()]
-    
-    cur.close()
-    
-    return {
-      'data': results,
-      'total': total_count,
-      'page': page,
-      'per_page': per_page,
-      'total_pages': (total_count + per_page - 1) // per_page
-    }
+  @staticmethod
+  def get_names():
+    """Mapping of college code to name, served from the same cache entry."""
+    return College._reference()['names']
+
+  @staticmethod
+  def _reference():
+    def load():
+      with get_db().cursor() as cur:
+        cur.execute('SELECT college_code, college_name FROM college ORDER BY college_code ASC')
+        rows = cur.fetchall()
+      return {'codes': [row[0] for row in rows], 'names': dict(rows)}
+    return _reference.get_or_load('all', load)
 
   @staticmethod
   def create(code, name):
@@ -59,6 +63,7 @@ class College:
     try:
       cur.execute('INSERT INTO college (college_code, college_name) VALUES (%s, %s)', (code, name))
       conn.commit()
+      bump('college')
       return True
     except Exception:
       conn.rollback()
@@ -74,6 +79,7 @@ class College:
       cur.execute('UPDATE college SET college_code = %s, college_name = %s WHERE college_code = %s', (new_code, name, old_code))
       conn.commit()
       if cur.rowcount > 0:
+        bump('college')
         return True, "College updated successfully"
       return False, "College not found"
     except Exception as e:
@@ -89,6 +95,8 @@ class College:
     try:
       cur.execute('DELETE FROM college WHERE college_code = %s', (code,))
       conn.commit()
+      if cur.rowcount > 0:
+        bump('college')
       return cur.rowcount > 0
     except Exception:
       conn.rollback()
@@ -1,55 +1,60 @@
-from app.db import get_db
+from app.db import aio, get_db
+from app.config import Config
+from app.db.bulk import iter_query
+from app.db.cache import VersionedCache, bump
+from app.db.listing import ListQuery
+
+# Dropdown reference data changes rarely, so it is kept in memory between writes
+_reference = VersionedCache('program', ttl=Config.REFERENCE_CACHE_TTL, name='program_reference')
 
 class Program:
+  COLUMNS = ('program_code', 'program_name', 'college_code')
+  SORT_COLUMNS = {'program_code', 'program_name', 'college_code'}
+  SEARCH_FIELDS = ('program_code', 'program_name', 'college_code')
+  LISTING = ListQuery('program', COLUMNS, 'program_code', SORT_COLUMNS, SEARCH_FIELDS)
+
   @staticmethod
-  def get_all(page=1, per_page=10, search_term=None, only_codes=False, sort_by='program_code', order='asc'):
+  def get_all(page=1, per_page=10, search_term=None, only_codes=False, sort_by='program_code', order='asc', cursor=None, count='exact', search_mode='contains'):
+    if only_codes:
+      return {'data': Program.get_codes()}
+
     conn = get_db()
-    cur = conn.cursor()
+    with conn.cursor() as cur:
+      return Program.LISTING.fetch(
+        cur, page, per_page, search_term, search_mode, sort_by, order, cursor, count
+      )
 
-    if only_codes:
-        cur.execute('SELECT program_code FROM program ORDER BY program_code ASC')
-        results = [row[0] for row in cur.fetchall()]
-        cur.close()
-        return {'data': results}
+  @staticmethod
+  async def get_all_async(conn, page=1, per_page=10, search_term=None, sort_by='program_code', order='asc', cursor=None, count='exact', search_mode='contains'):
+    """get_all() on an asyncpg connection (see app.db.aio); only_codes stays on the sync path."""
+    return await aio.fetch_list(
+      conn, Program.LISTING, page, per_page, search_term, search_mode, sort_by, order, cursor, count
+    )
+
+  @staticmethod
+  def export_rows(search_term=None, sort_by='program_code', order='asc', search_mode='contains', batch_size=2000):
+    """Iterates every matching row as a tuple in COLUMNS order, one server-side batch at a time."""
+    query, params = Program.LISTING.export_query(search_term, search_mode, sort_by, order)
+    return iter_query(query, params, batch_size)
 
-    query = 'SELECT program_code, program_name, college_code FROM program'
-    count_query = 'SELECT COUNT(*) FROM program'
-    
-    params = []
-    if search_term:
-      where_clause = ' WHERE program_code ILIKE %s OR program_name ILIKE %s OR college_code ILIKE %s'
-      query += where_clause
-      count_query += where_clause
-      term = f'%{search_term}%'
-      params.extend([term, term, term])
-    
-    cur.execute(count_query, params)
-    total_count = cur.fetchone()[0]
+  @staticmethod
+  def get_codes():
+    """All program codes in order, without a database round trip when cached."""
+    return Program._reference()['codes']
 
-    # Sorting
-    valid_sort_columns = {'program_code', 'program_name', 'college_code'}
-    if sort_by not in valid_sort_columns:
-        sort_by = 'program_code'
-    
-    sort_order = 'DESC' if order.lower() == 'desc' else 'ASC'
-    query += f' ORDER BY {sort_by} {sort_order} LIMIT %s OFFSET %s'
+  @staticmethod
+  def get_names():
+    """Mapping of program code to name, served from the same cache entry."""
+    return Program._reference()['names']
 
-    offset = (page - 1) * per_page
-    params.extend([per_page, offset])
-    
-    cur.execute(query, params)
-    columns = [desc[0] for desc in cur.description]
-    results = [dict(zip(columns, row)) for row in cur.fetchall()]
-    
-    cur.close()
-    
-    return {
-      'data': results,
-      'total': total_count,
-      'page': page,
-      'per_page': per_page,
-      'total_pages': (total_count + per_page - 1) // per_page
-    }
+  @staticmethod
+  def _reference():
+    def load():
+      with get_db().cursor() as cur:
+        cur.execute('SELECT program_code, program_name FROM program ORDER BY program_code ASC')
+        rows = cur.fetchall()
+      return {'codes': [row[0] for row in rows], 'names': dict(rows)}
+    return _reference.get_or_load('all', load)
 
   @staticmethod
   def create(code, name, college_code):
@@ -58,6 +63,7 @@ class Program:
     try:
       cur.execute('INSERT INTO program (program_code, program_name, college_code) VALUES (%s, %s, %s)', (code, name, college_code))
       conn.commit()
+      bump('program')
       return True
     except Exception:
       conn.rollback()
@@ -73,6 +79,7 @@ class Program:
       cur.execute('UPDATE program SET program_code = %s, program_name = %s, college_code = %s WHERE program_code = %s', (new_code, name, college_code, old_code))
       conn.commit()
       if cur.rowcount > 0:
+        bump('program')
         return True, "Program updated successfully"
       return False, "Program not found"
     except Exception as e:
@@ -89,6 +96,7 @@ class Program:
       cur.execute('DELETE FROM program WHERE program_code = %s', (code,))
       conn.commit()
       if cur.rowcount > 0:
+        bump('program')
         return True, "Program deleted successfully"
       return False, "Program not found"
     except Exception as e:
@@ -0,0 +1,153 @@
+from psycopg2 import errors
+from app.db import get_db
+from app.models.college import College
+from app.models.program import Program
+
+TABLE = 'enrollment_counts'
+
+# Students per (program, year level, gender), kept current by triggers on
+# student; the college comes from program at read time, so moving a program
+# between colleges needs no maintenance here. A group that empties stays at
+# zero, so its updated_at still records the write that emptied it.
+CREATE_TABLE = f'''
+  CREATE TABLE IF NOT EXISTS {TABLE} (
+    program_code VARCHAR(20),
+    year_level INTEGER NOT NULL,
+    gender VARCHAR(20),
+    students INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+  )
+'''
+# program_code and gender may be NULL, which a plain unique key treats as distinct
+KEY = "((program_code IS NULL), (COALESCE(program_code, '')), year_level, (gender IS NULL), (COALESCE(gender, '')))"
+CREATE_INDEX = f'CREATE UNIQUE INDEX IF NOT EXISTS {TABLE}_key ON {TABLE} {KEY}'
+
+# Adds the net change per group of a statement's rows. Groups are written in
+# key order so concurrent writers lock them in the same order.
+APPLY_DELTA = f'''
+    INSERT INTO {TABLE} AS c (program_code, year_level, gender, students)
+    SELECT program_code, year_level, gender, SUM(delta) FROM ({{rows}}) d
+    GROUP BY program_code, year_level, gender
+    HAVING SUM(delta) <> 0
+    ORDER BY program_code, year_level, gender
+    ON CONFLICT {KEY} DO UPDATE SET students = c.students + EXCLUDED.students, updated_at = NOW()
+'''
+NEW_ROWS = 'SELECT program_code, year_level, gender, 1 AS delta FROM new_rows'
+OLD_ROWS = 'SELECT program_code, year_level, gender, -1 AS delta FROM old_rows'
+
+CREATE_FUNCTION = f'''
+  CREATE OR REPLACE FUNCTION apply_enrollment_counts() RETURNS trigger AS $$
+  BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+      UPDATE {TABLE} SET students = 0, updated_at = NOW();
+      RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+      {APPLY_DELTA.format(rows=NEW_ROWS)};
+    ELSIF TG_OP = 'DELETE' THEN
+      {APPLY_DELTA.format(rows=OLD_ROWS)};
+    ELSE
+      {APPLY_DELTA.format(rows=NEW_ROWS + ' UNION ALL ' + OLD_ROWS)};
+    END IF;
+    RETURN NULL;
+  END;
+  $$ LANGUAGE plpgsql
+'''
+# Statement triggers see every row a statement (or COPY) wrote through its
+# transition tables; an update that changes none of the counted columns nets out.
+CREATE_TRIGGERS = [
+  'DROP TRIGGER IF EXISTS student_counts_insert ON student',
+  'DROP TRIGGER IF EXISTS student_counts_update ON student',
+  'DROP TRIGGER IF EXISTS student_counts_delete ON student',
+  'DROP TRIGGER IF EXISTS student_counts_truncate ON student',
+  '''CREATE TRIGGER student_counts_insert AFTER INSERT ON student
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_enrollment_counts()''',
+  '''CREATE TRIGGER student_counts_update AFTER UPDATE ON student
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_enrollment_counts()''',
+  '''CREATE TRIGGER student_counts_delete AFTER DELETE ON student
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_enrollment_counts()''',
+  '''CREATE TRIGGER student_counts_truncate AFTER TRUNCATE ON student
+    FOR EACH STATEMENT EXECUTE PROCEDURE apply_enrollment_counts()''',
+]
+# Fills the table from scratch; run with student locked against writes
+POPULATE = [
+  f'DELETE FROM {TABLE}',
+  f'''INSERT INTO {TABLE} (program_code, year_level, gender, students)
+    SELECT program_code, year_level, gender, COUNT(*) FROM student
+    GROUP BY program_code, year_level, gender''',
+]
+
+SUMMARY_QUERY = f'''
+  SELECT p.college_code, c.program_code, c.year_level, c.gender, c.students, c.updated_at
+  FROM {TABLE} c
+  LEFT JOIN program p ON p.program_code = c.program_code
+'''
+# Same rows computed from the base tables, for databases without the table
+LIVE_QUERY = '''
+  SELECT p.college_code, s.program_code, s.year_level, s.gender, COUNT(*)::integer AS students, NOW() AS updated_at
+  FROM student s
+  LEFT JOIN program p ON p.program_code = s.program_code
+  GROUP BY p.college_code, s.program_code, s.year_level, s.gender
+'''
+
+class EnrollmentStats:
+  @staticmethod
+  def summary():
+    """
+    Headcounts per college, program, year level and gender, rolled up from
+    the pre-aggregated rows of enrollment_counts, which are as current as
+    the student table; `updated_at` is the time of the last student write
+    that changed them. Without the table they are computed live, `live` is
+    set and `updated_at` is now.
+    """
+    conn = get_db()
+    live = False
+    with conn.cursor() as cur:
+      try:
+        cur.execute(SUMMARY_QUERY)
+      except errors.UndefinedTable:
+        conn.rollback()
+        live = True
+        cur.execute(LIVE_QUERY)
+      rows = cur.fetchall()
+
+    dimensions = ('college_code', 'program_code', 'year_level', 'gender')
+    totals = {name: {} for name in dimensions}
+    total = 0
+    updated_at = None
+    for row in rows:
+      if updated_at is None or row[5] > updated_at:
+        updated_at = row[5]
+      students = row[4]
+      if not students:
+        continue
+      total += students
+      for name, value in zip(dimensions, row[:4]):
+        totals[name][value] = totals[name].get(value, 0) + students
+
+    labels = {
+      'college_code': ('college_name', College.get_names()),
+      'program_code': ('program_name', Program.get_names()),
+    }
+
+    def breakdown(name):
+      # NULL groups (no program, no college, unspecified gender) sort last
+      items = sorted(totals[name].items(), key=lambda item: (item[0] is None, item[0]))
+      entries = [{name: value, 'students': count} for value, count in items]
+      if name in labels:
+        label, names = labels[name]
+        for entry in entries:
+          entry[label] = names.get(entry[name])
+      return entries
+
+    return {
+      'total': total,
+      'by_college': breakdown('college_code'),
+      'by_program': breakdown('program_code'),
+      'by_year_level': breakdown('year_level'),
+      'by_gender': breakdown('gender'),
+      'updated_at': updated_at.isoformat() if updated_at else None,
+      'live': live
+    }
@@ -1,12 +1,240 @@
-from app.db import get_db
+from app.db import aio, get_db
+from app.db.bulk import CopyStream, iter_query
+from app.db.cache import bump
+from app.db.listing import ListQuery, any_of
+import os
 import uuid
+import psycopg2
+from psycopg2.extras import execute_values
 from werkzeug.utils import secure_filename
-from flask import current_app
-from supabase import create_client
+from app.jobs import photo_jobs, QueueFull
+from app.storage import get_storage, spool
+from app.storage.images import DERIVATIVE_FORMAT, ORIGINAL_NAME, derivative_key, make_derivatives, photo_urls
+
+# Folder inside the storage backend that holds student photos
+PHOTO_FOLDER = 'student photos'
+
+# Column aliases accepted by the import and batch endpoints, same as the JSON routes
+FIELD_ALIASES = {
+  'student_id': ('student_id', 'id'),
+  'first_name': ('first_name', 'firstname'),
+  'last_name': ('last_name', 'lastname'),
+  'year_level': ('year_level', 'year'),
+  'gender': ('gender',),
+  'program_code': ('program_code', 'program'),
+}
+
+def _field_value(record, field):
+  for alias in FIELD_ALIASES[field]:
+    value = record.get(alias)
+    if value is not None and str(value).strip():
+      return str(value).strip()
+  return None
+
+def _staged_rows(records, counters):
+  """Turns parsed records into staging rows, flagging row-local problems up front."""
+  for line_no, record, error in records:
+    counters['received'] += 1
+    if error:
+      yield (line_no, None, None, None, None, None, None, error)
+      continue
+
+    row = {field: _field_value(record, field) for field in FIELD_ALIASES}
+    missing = [f for f in ('student_id', 'first_name', 'last_name', 'year_level', 'program_code') if not row[f]]
+    problems = []
+    if missing:
+      problems.append('Missing required fields: ' + ', '.join(missing))
+    # Checked on its own: the staging column is an integer, so a bad value must never reach COPY
+    if row['year_level'] and (not row['year_level'].isdigit() or len(row['year_level']) > 9):
+      problems.append('year_level must be a whole number')
+      row['year_level'] = None
+    yield (line_no, row['student_id'], row['first_name'], row['last_name'],
+           row['year_level'], row['gender'], row['program_code'], '; '.join(problems) or None)
+
+REQUIRED_FIELDS = ('student_id', 'first_name', 'last_name', 'year_level', 'program_code')
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+def _year_level(value):
+  if value is None or not str(value).isdigit() or len(str(value)) > 9:
+    raise ValueError('year_level must be a whole number')
+  return int(value)
+
+def _parse_operation(index, operation):
+  """Validates one batch entry; returns a dict with the group key and statement values."""
+  if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+    raise ValueError(f"op must be one of: {', '.join(BATCH_OPERATIONS)}")
+  kind = operation['op']
+  data = operation.get('data') or {}
+
+  if kind == 'create':
+    row = {field: _field_value(data, field) for field in FIELD_ALIASES}
+    missing = [f for f in REQUIRED_FIELDS if not row[f]]
+    if missing:
+      raise ValueError('Missing required fields: ' + ', '.join(missing))
+    row['year_level'] = _year_level(row['year_level'])
+    return {'index': index, 'op': kind, 'student_id': row['student_id'], 'key': (kind,),
+            'values': tuple(row[f] for f in FIELD_ALIASES)}
+
+  student_id = operation.get('student_id') or operation.get('id')
+  if not student_id:
+    raise ValueError('student_id is required')
+  if kind == 'delete':
+    return {'index': index, 'op': kind, 'student_id': str(student_id), 'key': (kind,), 'values': ()}
+
+  # Updates only touch the fields that were sent
+  fields = tuple(f for f in FIELD_ALIASES if any(alias in data for alias in FIELD_ALIASES[f]))
+  if not fields:
+    raise ValueError('No fields to update')
+  values = {f: _field_value(data, f) for f in fields}
+  empty = [f for f in fields if f in REQUIRED_FIELDS and not values[f]]
+  if empty:
+    raise ValueError('Fields cannot be empty: ' + ', '.join(empty))
+  if 'year_level' in values:
+    values['year_level'] = _year_level(values['year_level'])
+  return {'index': index, 'op': kind, 'student_id': str(student_id), 'key': (kind, fields),
+          'values': tuple(values[f] for f in fields)}
+
+def _batch_groups(items):
+  """
+  Splits parsed operations into runs that can share one statement: consecutive
+  entries with the same key, never touching the same student twice. Running
+  the runs in order keeps the request's ordering semantics.
+  """
+  groups = []
+  for item in items:
+    if groups and groups[-1][0] == item['key'] and item['student_id'] not in groups[-1][2]:
+      groups[-1][1].append(item)
+      groups[-1][2].add(item['student_id'])
+    else:
+      groups.append((item['key'], [item], {item['student_id']}))
+  return [(key, group) for key, group, _ in groups]
+
+def _run_group(cur, key, items):
+  """Executes a group as a single multi-row statement; returns the student IDs it affected."""
+  kind = key[0]
+  if kind == 'create':
+    execute_values(
+      cur,
+      'INSERT INTO student (student_id, first_name, last_name, year_level, gender, program_code) VALUES %s',
+      [item['values'] for item in items],
+      page_size=len(items)
+    )
+    return {item['student_id'] for item in items}
+
+  if kind == 'delete':
+    cur.execute(
+      'DELETE FROM student WHERE student_id = ANY(%s) RETURNING student_id',
+      ([item['student_id'] for item in items],)
+    )
+    return {row[0] for row in cur.fetchall()}
+
+  fields = key[1]
+  casts = ', '.join('%s::integer' if f == 'year_level' else '%s::text' for f in fields)
+  rows = execute_values(
+    cur,
+    f'''UPDATE student AS s SET {', '.join(f'{f} = v.{f}' for f in fields)}
+       FROM (VALUES %s) AS v(old_id, {', '.join(fields)})
+       WHERE s.student_id = v.old_id
+       RETURNING v.old_id''',
+    [(item['student_id'],) + item['values'] for item in items],
+    template=f'(%s, {casts})',
+    page_size=len(items),
+    fetch=True
+  )
+  return {row[0] for row in rows}
+
+def _program_filter(codes):
+  """Program filter where the pseudo-code 'None' selects students without a program."""
+  if 'None' not in codes:
+    return 'program_code = ANY(%s)', [codes]
+  clean_codes = [p for p in codes if p != 'None']
+  if clean_codes:
+    return '(program_code = ANY(%s) OR program_code IS NULL)', [clean_codes]
+  return 'program_code IS NULL', []
+
+def _year_filter(values):
+  # Compared as integers, so the year_level indexes apply
+  return 'year_level = ANY(%s)', [[_year_level(value) for value in values]]
+
+def _store_photo(storage, student_id, key, spooled, content_type):
+  """
+  Background job: renders the derivatives in the image process pool,
+  streams them and the original to storage, and records the photo URL.
+  """
+  stored = []
+  try:
+    derivatives = make_derivatives(spooled)
+    try:
+      for name, path in derivatives.items():
+        derived = derivative_key(key, name)
+        storage.upload(derived, path, f'image/{DERIVATIVE_FORMAT}')
+        stored.append(derived)
+    finally:
+      for path in derivatives.values():
+        os.unlink(path)
+    storage.upload(key, spooled, content_type)
+    stored.append(key)
+  except Exception:
+    for stored_key in stored:
+      storage.delete(stored_key)
+    raise
+  finally:
+    os.unlink(spooled)
+
+  photo_url = storage.public_url(key)
+  if not photo_url:
+    raise RuntimeError('Failed to retrieve photo URL')
+  if not Student.update_photo_url(student_id, photo_url):
+    for stored_key in stored:
+      storage.delete(stored_key)
+    raise LookupError('Student not found')
+  return {'photo_url': photo_url, 'photo_urls': photo_urls(photo_url)}
+
+def _with_thumbnails(result):
+  # Tables render avatars, so rows default to the smallest stored size
+  for student in result['data']:
+    urls = photo_urls(student['photo_url'])
+    student['photo_urls'] = urls
+    if urls:
+      student['photo_url'] = next(iter(urls.values()))
+  return result
+
+def _student_dict(row):
+  if not row:
+    return None
+  return {
+    'student_id': row[0],
+    'first_name': row[1],
+    'last_name': row[2],
+    'year_level': row[3],
+    'gender': row[4],
+    'program_code': row[5],
+    'photo_url': row[6],
+    'photo_urls': photo_urls(row[6])
+  }
+
+def _db_error(e):
+  return ' '.join(str(e).split())
 
 class Student:
+  COLUMNS = ('student_id', 'first_name', 'last_name', 'year_level', 'gender', 'program_code', 'photo_url')
+  # Whitelist sort columns to prevent SQL injection
+  SORT_COLUMNS = {'student_id', 'first_name', 'last_name', 'year_level', 'gender', 'program_code'}
+  SEARCH_FIELDS = ('student_id', 'first_name', 'last_name', 'gender', 'program_code')
+  IMPORT_ERROR_LIMIT = 1000
+  BATCH_LIMIT = 1000
+  LISTING = ListQuery(
+    'student', COLUMNS, 'student_id', SORT_COLUMNS, SEARCH_FIELDS,
+    filters={
+      'program_code': _program_filter,
+      'year_level': _year_filter,
+      'gender': any_of('gender'),
+    },
+    facets=('program_code', 'year_level', 'gender')
+  )
+
   @staticmethod
-  def get_all(page=1, per_page=10, search_term=None, program_code=None, year_level=None, gender=None, sort_by='student_id', order='asc', only_codes=False):
+  def get_all(page=1, per_page=10, search_term=None, program_code=None, year_level=None, gender=None, sort_by='student_id', order='asc', only_codes=False, cursor=None, count='exact', search_mode='contains', facets=False):
     conn = get_db()
     cur = conn.cursor()
 
@@ -16,81 +244,37 @@ class Student:
         cur.close()
         return {'data': results}
 
-    # Base query
-    query = '''
-        SELECT student_id, first_name, last_name, year_level, gender, program_code, photo_url
-        FROM student
-    '''
-    count_query = 'SELECT COUNT(*) FROM student'
-    
-    conditions = []
-    params = []
-
-    # Filters/search
-    if search_term:
-      conditions.append('''
-          (student_id ILIKE %s OR first_name ILIKE %s OR 
-            last_name ILIKE %s OR gender ILIKE %s OR program_code ILIKE %s)
-      ''')
-      like_term = f'%{search_term}%'
-      params.extend([like_term] * 5)
-    
-    if program_code:
-      if 'None' in program_code:
-        clean_codes = [p for p in program_code if p != 'None']
-        if clean_codes:
-          conditions.append('(program_code = ANY(%s) OR program_code IS NULL)')
-          params.append(clean_codes)
-        else:
-          conditions.append('program_code IS NULL')
-      else:
-        conditions.append('program_code = ANY(%s)')
-        params.append(program_code)
-
-    if year_level:
-      conditions.append('year_level::text = ANY(%s)')
-      params.append(year_level)
-
-    if gender:
-      conditions.append('gender = ANY(%s)')
-      params.append(gender)
-
-    # WHERE clause (for filters)
-    if conditions:
-      where_clause = ' WHERE ' + ' AND '.join(conditions)
-      query += where_clause
-      count_query += where_clause
-    
-    # Get total count
-    cur.execute(count_query, params)
-    total_count = cur.fetchone()[0]
-
-    # Pagination
-    # Whitelist sort columns to prevent SQL injection
-    valid_sort_columns = {'student_id', 'first_name', 'last_name', 'year_level', 'gender', 'program_code'}
-    if sort_by not in valid_sort_columns:
-        sort_by = 'student_id'
-    
-    sort_order = 'DESC' if order.lower() == 'desc' else 'ASC'
-    
-    query += f' ORDER BY {sort_by} {sort_order} LIMIT %s OFFSET %s'
-    offset = (page - 1) * per_page
-    params.extend([per_page, offset])
-    
-    # Execute query
-    cur.execute(query, params)
-    columns = [desc[0] for desc in cur.description]
-    results = [dict(zip(columns, row)) for row in cur.fetchall()]
-    
-    cur.close()
-    
-    return {
-      'data': results,
-      'total': total_count,
-      'page': page,
-      'per_page': per_page,
-      'total_pages': (total_count + per_page - 1) // per_page
-    }
+    try:
+      result = Student.LISTING.fetch(
+        cur, page, per_page, search_term, search_mode, sort_by, order, cursor, count, facets,
+        program_code=program_code, year_level=year_level, gender=gender
+      )
+    finally:
+      cur.close()
+    return _with_thumbnails(result)
+
+  @staticmethod
+  async def get_all_async(conn, page=1, per_page=10, search_term=None, program_code=None, year_level=None, gender=None, sort_by='student_id', order='asc', cursor=None, count='exact', search_mode='contains', facets=False):
+    """get_all() on an asyncpg connection (see app.db.aio); only_codes stays on the sync path."""
+    result = await aio.fetch_list(
+      conn, Student.LISTING, page, per_page, search_term, search_mode, sort_by, order, cursor, count, facets,
+      program_code=program_code, year_level=year_level, gender=gender
+    )
+    return _with_thumbnails(result)
+
+  @staticmethod
+  def export_rows(search_term=None, program_code=None, year_level=None, gender=None,
+                  sort_by='student_id', order='asc', search_mode='contains', batch_size=2000):
+    """
+    Iterates every matching row as a tuple in COLUMNS order.
+    A server-side cursor fetches `batch_size` rows per round trip, so only one
+    batch is in memory no matter how many rows match.
+    """
+    query, params = Student.LISTING.export_query(
+      search_term, search_mode, sort_by, order,
+      program_code=program_code, year_level=year_level, gender=gender
+    )
+    return iter_query(query, params, batch_size)
 
   @staticmethod
   def create(student_id, first_name, last_name, year_level, gender, program_code):
@@ -103,6 +287,7 @@ class Student:
         (student_id, first_name, last_name, year_level, gender, program_code)
       )
       conn.commit()
+      bump('student')
       return True
     except Exception as e:
       conn.rollback()
@@ -119,23 +304,20 @@ class Student:
         'SELECT student_id, first_name, last_name, year_level, gender, program_code, photo_url FROM student WHERE student_id = %s',
         (student_id,)
       )
-      row = cur.fetchone()
-      if row:
-        return {
-          'student_id': row[0],
-          'first_name': row[1],
-          'last_name': row[2],
-          'year_level': row[3],
-          'gender': row[4],
-          'program_code': row[5],
-          'photo_url': row[6]
-        }
-      return None
+      return _student_dict(cur.fetchone())
     except Exception as e:
       raise e
     finally:
       cur.close()
   
+  @staticmethod
+  async def get_by_id_async(conn, student_id):
+    return _student_dict(await aio.fetchrow(
+      conn,
+      'SELECT student_id, first_name, last_name, year_level, gender, program_code, photo_url FROM student WHERE student_id = %s',
+      (student_id,)
+    ))
+
   @staticmethod
   def update(old_id, new_id, first_name, last_name, year_level, gender, program_code):
     conn = get_db()
@@ -149,6 +331,8 @@ class Student:
       )
       affected = cur.rowcount
       conn.commit()
+      if affected:
+        bump('student')
       return affected > 0
     except Exception as e:
       conn.rollback()
@@ -164,6 +348,8 @@ class Student:
       cur.execute('DELETE FROM student WHERE student_id = %s', (student_id,))
       affected = cur.rowcount
       conn.commit()
+      if affected:
+        bump('student')
       return affected > 0
     except Exception as e:
       conn.rollback()
@@ -171,6 +357,170 @@ class Student:
     finally:
       cur.close()
 
+  @staticmethod
+  def import_rows(records):
+    """
+    Creates or updates students from `iter_records` output in one transaction.
+    Rows are streamed into a staging table with COPY, program codes and
+    duplicate IDs are checked with set-based SQL, and valid rows are upserted.
+    Invalid rows are skipped and reported (the first IMPORT_ERROR_LIMIT, by line).
+    """
+    counters = {'received': 0}
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+      cur.execute('''
+        CREATE TEMP TABLE student_import (
+          line_no integer, student_id text, first_name text, last_name text,
+          year_level integer, gender text, program_code text, error text
+        ) ON COMMIT DROP
+      ''')
+      cur.copy_expert('COPY student_import FROM STDIN WITH (FORMAT csv)', CopyStream(_staged_rows(records, counters)))
+
+      cur.execute('''
+        UPDATE student_import s
+        SET error = 'Duplicate student_id (first seen on line ' || d.first_line || ')'
+        FROM (
+          SELECT line_no, min(line_no) OVER (PARTITION BY student_id) AS first_line
+          FROM student_import WHERE error IS NULL
+        ) d
+        WHERE s.line_no = d.line_no AND d.line_no <> d.first_line
+      ''')
+      cur.execute('''
+        UPDATE student_import s SET error = 'Unknown program_code: ' || s.program_code
+        WHERE s.error IS NULL
+          AND NOT EXISTS (SELECT 1 FROM program p WHERE p.program_code = s.program_code)
+      ''')
+
+      cur.execute('''
+        WITH merged AS (
+          INSERT INTO student (student_id, first_name, last_name, year_level, gender, program_code)
+          SELECT student_id, first_name, last_name, year_level, gender, program_code
+          FROM student_import WHERE error IS NULL
+          ON CONFLICT (student_id) DO UPDATE SET
+            first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name,
+            year_level = EXCLUDED.year_level, gender = EXCLUDED.gender,
+            program_code = EXCLUDED.program_code
+          RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+      ''')
+      inserted, updated = cur.fetchone()
+
+      cur.execute('SELECT count(*) FROM student_import WHERE error IS NOT NULL')
+      failed = cur.fetchone()[0]
+      cur.execute(
+        'SELECT line_no, student_id, error FROM student_import WHERE error IS NOT NULL ORDER BY line_no LIMIT %s',
+        (Student.IMPORT_ERROR_LIMIT,)
+      )
+      errors = [{'line': line, 'student_id': sid, 'error': error} for line, sid, error in cur.fetchall()]
+      conn.commit()
+    except Exception as e:
+      conn.rollback()
+      raise e
+    finally:
+      cur.close()
+
+    if inserted or updated:
+      bump('student')
+    return {
+      'received': counters['received'],
+      'inserted': inserted,
+      'updated': updated,
+      'failed': failed,
+      'errors': errors,
+      'errors_truncated': failed > len(errors)
+    }
+
+  @staticmethod
+  def batch(operations, atomic=True):
+    """
+    Applies a list of create/update/delete operations in one transaction.
+    Consecutive operations of the same shape run as one multi-row statement.
+    Atomic mode rolls everything back if any operation fails or finds no student;
+    otherwise each group runs under a savepoint and failures are reported per item.
+    """
+    if not isinstance(operations, list) or not operations:
+      raise ValueError('operations must be a non-empty list')
+    if len(operations) > Student.BATCH_LIMIT:
+      raise ValueError(f'At most {Student.BATCH_LIMIT} operations per batch')
+
+    results = [{'index': i, 'op': op.get('op') if isinstance(op, dict) else None, 'status': 'pending'}
+               for i, op in enumerate(operations)]
+    items = []
+    for i, operation in enumerate(operations):
+      try:
+        item = _parse_operation(i, operation)
+        results[i]['student_id'] = item['student_id']
+        items.append(item)
+      except ValueError as e:
+        results[i].update(status='error', error=str(e))
+
+    def finish(committed):
+      for result in results:
+        if result['status'] in ('pending', 'ok') and not committed:
+          result['status'] = 'rolled_back'
+      failed = sum(1 for r in results if r['status'] in ('error', 'not_found'))
+      return {'committed': committed, 'succeeded': len(results) - failed if committed else 0,
+              'failed': failed, 'results': results}
+
+    if atomic and len(items) < len(operations):
+      return finish(False)
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+      for key, group in _batch_groups(items):
+        if atomic:
+          try:
+            affected = _run_group(cur, key, group)
+          except psycopg2.Error as e:
+            conn.rollback()
+            for item in group:
+              results[item['index']].update(status='error', error=_db_error(e))
+            return finish(False)
+        else:
+          cur.execute('SAVEPOINT batch_group')
+          try:
+            affected = _run_group(cur, key, group)
+            cur.execute('RELEASE SAVEPOINT batch_group')
+          except psycopg2.Error:
+            # Re-run the group one item at a time to find the failing entries
+            cur.execute('ROLLBACK TO SAVEPOINT batch_group')
+            affected = set()
+            for item in group:
+              cur.execute('SAVEPOINT batch_item')
+              try:
+                affected |= _run_group(cur, key, [item])
+                cur.execute('RELEASE SAVEPOINT batch_item')
+              except psycopg2.Error as e:
+                cur.execute('ROLLBACK TO SAVEPOINT batch_item')
+                results[item['index']].update(status='error', error=_db_error(e))
+
+        for item in group:
+          result = results[item['index']]
+          if result['status'] != 'pending':
+            continue
+          if item['student_id'] in affected:
+            result['status'] = 'ok'
+          else:
+            result.update(status='not_found', error='Student not found')
+
+        if atomic and any(results[item['index']]['status'] == 'not_found' for item in group):
+          conn.rollback()
+          return finish(False)
+
+      conn.commit()
+    except Exception as e:
+      conn.rollback()
+      raise e
+    finally:
+      cur.close()
+
+    if any(r['status'] == 'ok' for r in results):
+      bump('student')
+    return finish(True)
+
   @staticmethod
   def update_photo_url(student_id, photo_url):
       conn = get_db()
@@ -179,46 +529,34 @@ class Student:
               "UPDATE student SET photo_url = %s WHERE student_id = %s",
               (photo_url, student_id)
           )
+          updated = cursor.rowcount > 0
           conn.commit()
+      bump('student')
+      return updated
 
   @staticmethod
   def upload_photo(student_id, file):
+    """
+    Spools the upload to a temporary file and queues it for storage.
+    Returns (success, message, job_id); the job's result holds the photo URLs.
+    """
     try:
-      url = current_app.config.get('SUPABASE_URL')
-      key = current_app.config.get('SUPABASE_KEY')
-      
-      if not url or not key:
-          return False, "Supabase credentials missing", None
-
-      supabase = create_client(url, key)
-      storage_url = str(supabase.storage_url)
-      if not storage_url.endswith('/'):
-          supabase.storage_url = storage_url + '/'
-
-      # Generate unique filename
-      filename = secure_filename(file.filename)
-      ext = filename.rsplit('.', 1)[1].lower()
-      unique_filename = f"{student_id}_{uuid.uuid4().hex[:8]}.{ext}"
-      
-      bucket_name = 'SSIS'
-      folder_name = 'student photos'
-      file_path = f"{folder_name}/{unique_filename}"
-      
-      # Read file content
-      file_content = file.read()
-      
-      supabase.storage.from_(bucket_name).upload(
-          path=file_path,
-          file=file_content,
-          file_options={"content-type": file.content_type}
-      )
-      
-      # Get Public URL
-      photo_url = supabase.storage.from_(bucket_name).get_public_url(file_path)
-      
-      if photo_url:
-          Student.update_photo_url(student_id, photo_url)
-          return True, "File uploaded successfully", photo_url
-      return False, "Failed to retrieve photo URL", None
-    except Exception as e:
+      storage = get_storage()
+    except ValueError as e:
       return False, str(e), None
+
+    # Generate a unique folder; the derivatives are stored next to the original
+    filename = secure_filename(file.filename)
+    ext = filename.rsplit('.', 1)[1].lower()
+    key = f"{PHOTO_FOLDER}/{student_id}_{uuid.uuid4().hex[:8]}/{ORIGINAL_NAME}.{ext}"
+
+    spooled = spool(file.stream)
+    try:
+      job_id = photo_jobs.submit(
+        _store_photo, storage, student_id, key, spooled, file.content_type,
+        kind='photo', student_id=student_id
+      )
+    except QueueFull:
+      os.unlink(spooled)
+      raise
+    return True, "Upload queued", job_id
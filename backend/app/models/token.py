@@ -1,26 +1,122 @@
+import threading
+import time
+from datetime import timedelta
+from app.config import Config
 from app.db import get_db
 
+class RevocationIndex:
+    """
+    In-process copy of the blocklist so the per-request revocation check
+    normally needs no query. Each jti is kept until its token would have
+    expired anyway, then dropped.
+    """
+    # Rows are matched on created_at, which is the inserting transaction's
+    # start time; re-reading a short window catches late commits.
+    OVERLAP = timedelta(minutes=1)
+
+    def __init__(self, refresh_interval, token_lifetime):
+        self.refresh_interval = refresh_interval
+        self.token_lifetime = token_lifetime
+        self._expiry = {}
+        self._synced_until = None
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._expiry[jti] = max(exp, self._expiry.get(jti, 0))
+
+    def contains(self, jti):
+        exp = self._expiry.get(jti)
+        return exp is not None and exp > time.time()
+
+    def refresh_if_due(self):
+        """Pulls rows added by other processes; at most one thread refreshes at a time."""
+        if time.monotonic() < self._next_refresh or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh()
+            self._next_refresh = time.monotonic() + self.refresh_interval
+        except Exception:
+            # Keep serving the entries we have; the next request retries
+            pass
+        finally:
+            self._refresh_lock.release()
+
+    async def refresh_if_due_async(self, fetch):
+        """refresh_if_due() for the async server; `fetch` runs a query and returns its rows."""
+        if time.monotonic() < self._next_refresh or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._apply(await fetch(*self._refresh_query()))
+            self._next_refresh = time.monotonic() + self.refresh_interval
+        except Exception:
+            pass
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        conn = get_db()
+        with conn.cursor() as cur:
+            cur.execute(*self._refresh_query())
+            rows = cur.fetchall()
+        self._apply(rows)
+
+    def _refresh_query(self):
+        if self._synced_until is None:
+            return (
+                'SELECT jti, created_at, EXTRACT(EPOCH FROM NOW() - created_at) FROM token_blocklist '
+                'WHERE created_at > NOW() - %s::interval',
+                (self.token_lifetime,)
+            )
+        return (
+            'SELECT jti, created_at, EXTRACT(EPOCH FROM NOW() - created_at) FROM token_blocklist '
+            'WHERE created_at > %s',
+            (self._synced_until - self.OVERLAP,)
+        )
+
+    def _apply(self, rows):
+        lifetime = self.token_lifetime.total_seconds()
+        now = time.time()
+        with self._lock:
+            for jti, created_at, age in rows:
+                # The token was issued before it was revoked, so it expires within one lifetime
+                exp = now - float(age) + lifetime
+                self._expiry[jti] = max(exp, self._expiry.get(jti, 0))
+                if self._synced_until is None or created_at > self._synced_until:
+                    self._synced_until = created_at
+            for jti in [jti for jti, exp in self._expiry.items() if exp <= now]:
+                del self._expiry[jti]
+
+_index = RevocationIndex(Config.REVOCATION_REFRESH_SECONDS, Config.JWT_ACCESS_TOKEN_EXPIRES)
+
 class TokenBlocklist:
     @staticmethod
-    def add(jti):
+    def add(jti, exp=None):
         try:
             conn = get_db()
             with conn.cursor() as cur:
                 cur.execute('INSERT INTO token_blocklist (jti) VALUES (%s)', (jti,))
                 conn.commit()
-                return True
+            if exp is None:
+                exp = time.time() + Config.JWT_ACCESS_TOKEN_EXPIRES.total_seconds()
+            _index.add(jti, exp)
+            return True
         except Exception:
             return False
 
     @staticmethod
     def is_revoked(jti):
-        try:
-            conn = get_db()
-            with conn.cursor() as cur:
-                cur.execute('SELECT 1 FROM token_blocklist WHERE jti = %s', (jti,))
-                return cur.fetchone() is not None
-        except Exception:
-            return False
+        """Checks the local index, syncing it with the table every few seconds."""
+        _index.refresh_if_due()
+        return _index.contains(jti)
+
+    @staticmethod
+    async def is_revoked_async(jti, fetch):
+        """is_revoked() for the async server, syncing through `fetch` (see app.db.aio)."""
+        await _index.refresh_if_due_async(fetch)
+        return _index.contains(jti)
 
     @staticmethod
     def cleanup():
@@ -1,8 +1,25 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 from psycopg2.extras import RealDictCursor
+from app.config import Config
 from app.db import get_db
+from app.db.cache import VersionedCache, bump
 import secrets
 
+# Public fields only (never the password hash), by username.
+# Every write to users must bump('users'), which drops them all.
+_identities = VersionedCache('users', max_entries=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL, name='user_identity')
+
+IDENTITY_QUERY = 'SELECT id, username, email FROM users WHERE username = %s'
+
+def _remember(row, version):
+  identity = {'id': row[0], 'username': row[1], 'email': row[2]}
+  _identities.put(identity['username'], identity, version)
+  return dict(identity)
+
+def _cached(username):
+  identity = _identities.get(username)
+  return dict(identity) if identity is not None else None
+
 class User:
   """
   Handles user data,
@@ -19,10 +36,12 @@ class User:
   def get(user_id):
     """Fetch a user by their unique ID."""
     db = get_db()
+    version = _identities.version()
     with db.cursor(cursor_factory=RealDictCursor) as cursor:
         cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
         data = cursor.fetchone()
     if data:
+        _remember((data['id'], data['username'], data['email']), version)
         return User(data['id'], data['username'], data['email'], data.get('password'), data.get('google_id'))
     return None
 
@@ -30,10 +49,12 @@ class User:
   def get_by_username(username):
     """Fetch a user by their username."""
     db = get_db()
+    version = _identities.version()
     with db.cursor(cursor_factory=RealDictCursor) as cursor:
         cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
         data = cursor.fetchone()
     if data:
+        _remember((data['id'], data['username'], data['email']), version)
         return User(data['id'], data['username'], data['email'], data.get('password'), data.get('google_id'))
     return None
 
@@ -41,13 +62,41 @@ class User:
   def get_by_email(email):
     """Fetch a user by their email address."""
     db = get_db()
+    version = _identities.version()
     with db.cursor(cursor_factory=RealDictCursor) as cursor:
         cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
         data = cursor.fetchone()
     if data:
+        _remember((data['id'], data['username'], data['email']), version)
         return User(data['id'], data['username'], data['email'], data.get('password'), data.get('google_id'))
     return None
 
+  @staticmethod
+  def identity(username):
+    """
+    Public fields (id, username, email) of a user, usually without a query.
+    They stay cached for USER_CACHE_TTL seconds unless users is written
+    first. Unknown names are not cached, so new users are found at once.
+    """
+    identity = _cached(username)
+    if identity is None:
+        version = _identities.version()
+        with get_db().cursor() as cursor:
+            cursor.execute(IDENTITY_QUERY, (username,))
+            row = cursor.fetchone()
+        identity = _remember(row, version) if row else None
+    return identity
+
+  @staticmethod
+  async def identity_async(username, fetch):
+    """identity() for the async server; `fetch` runs a query and returns its rows (see app.asgi)."""
+    identity = _cached(username)
+    if identity is None:
+        version = _identities.version()
+        rows = await fetch(IDENTITY_QUERY, (username,))
+        identity = _remember(rows[0], version) if rows else None
+    return identity
+
   @staticmethod
   def create(username, email, password=None, google_id=None):
       """
@@ -68,7 +117,9 @@ class User:
           )
           user_id = cursor.fetchone()['id']
           db.commit()
-          
+      bump('users')
+      _remember((user_id, username, email), _identities.version())
+
       return User(user_id, username, email, hashed_pw, google_id)
 
   def check_password(self, password):
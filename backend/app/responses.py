@@ -0,0 +1,80 @@
+import gzip
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+COMPRESSIBLE_TYPES = {'application/json', 'text/html', 'text/csv', 'text/plain', 'application/x-ndjson'}
+
+class OrjsonProvider(DefaultJSONProvider):
+  """
+  JSON provider backed by orjson. Output matches the default provider:
+  keys are sorted when `sort_keys` is set, and dates, decimals and other
+  non-native types go through the same fallback.
+  """
+  def _options(self, **kwargs):
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if kwargs.get('sort_keys', self.sort_keys):
+      options |= orjson.OPT_SORT_KEYS
+    if self.compact is False or (self.compact is None and self._app.debug):
+      options |= orjson.OPT_INDENT_2
+    return options
+
+  def dumps(self, obj, **kwargs):
+    return orjson.dumps(obj, default=self.default, option=self._options(**kwargs)).decode()
+
+  def loads(self, s, **kwargs):
+    return orjson.loads(s)
+
+  def response(self, *args, **kwargs):
+    obj = self._prepare_response_obj(args, kwargs)
+    body = orjson.dumps(obj, default=self.default, option=self._options())
+    return self._app.response_class(body, mimetype=self.mimetype)
+
+def choose_encoding(accepted):
+  """'br', 'gzip' or None for a parsed Accept-Encoding header (werkzeug's Accept)."""
+  if brotli is not None and accepted['br']:
+    return 'br'
+  if accepted['gzip']:
+    return 'gzip'
+  return None
+
+def compress_body(body, encoding, gzip_level=6, brotli_quality=4):
+  if encoding == 'br':
+    return brotli.compress(body, quality=brotli_quality)
+  return gzip.compress(body, gzip_level, mtime=0)
+
+def compress_response(response, min_size, gzip_level=6, brotli_quality=4):
+  """Compresses a buffered text/JSON body in place if the client accepts it."""
+  if (response.status_code < 200 or response.status_code in (204, 304)
+      or response.direct_passthrough or response.is_streamed
+      or 'Content-Encoding' in response.headers
+      or response.mimetype not in COMPRESSIBLE_TYPES):
+    return response
+
+  response.vary.add('Accept-Encoding')
+  body = response.get_data()
+  encoding = choose_encoding(request.accept_encodings) if len(body) >= min_size else None
+  if encoding is None:
+    return response
+
+  response.set_data(compress_body(body, encoding, gzip_level, brotli_quality))
+  response.headers['Content-Encoding'] = encoding
+  return response
+
+def init_app(app):
+  """Uses orjson when it is installed and compresses responses over COMPRESS_MIN_SIZE bytes."""
+  if orjson is not None and app.config.get('FAST_JSON'):
+    app.json = OrjsonProvider(app)
+
+  if app.config.get('COMPRESS_RESPONSES'):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    app.after_request(lambda response: compress_response(response, min_size))
@@ -0,0 +1,32 @@
+from flask import Blueprint, current_app, request, jsonify
+from app.db.slowlog import slow_queries
+from app.metrics import bearer_matches
+
+# Registered only when METRICS_TOKEN is set (see create_app): the slow log
+# holds raw SQL, parameters and plans, so it takes the operator token that
+# guards /api/metrics rather than a user login anyone can register for.
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+def require_token():
+  if not bearer_matches(current_app.config['METRICS_TOKEN']):
+    return jsonify({'error': 'Invalid metrics token'}), 401
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+def get_slow_queries():
+  """Recent slow statements of this worker process, newest first, with any captured plans."""
+  try:
+    limit = request.args.get('limit', '50')
+    if not limit.isdigit() or int(limit) < 1:
+      raise ValueError('limit must be a positive integer')
+    include_plans = request.args.get('plans', 'true').lower() == 'true'
+    entries = slow_queries.entries(int(limit))
+    if not include_plans:
+      entries = [{key: value for key, value in entry.items() if key != 'plan'} for entry in entries]
+    return jsonify({
+      'threshold_ms': slow_queries.threshold * 1000,
+      'sample_rate': slow_queries.sample_rate,
+      'data': entries
+    }), 200
+  except ValueError as e:
+    return jsonify({'error': str(e)}), 400
@@ -1,15 +1,23 @@
 from flask import Blueprint, request, jsonify, url_for, redirect, current_app
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, jwt_required, get_current_user, get_jwt
 from app.models.user import User
 from app.models.token import TokenBlocklist
 from app import oauth, jwt
+from app.metrics import timed
 
 auth_bp = Blueprint('auth', __name__)
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
     jti = jwt_payload["jti"]
-    return TokenBlocklist.is_revoked(jti)
+    with timed('auth'):
+        return TokenBlocklist.is_revoked(jti)
+
+@jwt.user_lookup_loader
+def load_current_user(jwt_header, jwt_payload):
+    """Resolves get_current_user() from the identity cache; tokens of unknown users get a 401."""
+    with timed('auth'):
+        return User.identity(jwt_payload["sub"])
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -40,8 +48,8 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt()['jti']
-    if TokenBlocklist.add(jti):
+    claims = get_jwt()
+    if TokenBlocklist.add(claims['jti'], claims.get('exp')):
         return jsonify({'message': 'Successfully logged out'}), 200
     return jsonify({'error': 'Logout failed'}), 500
 
@@ -58,7 +66,7 @@ def register():
     if not username or not email or not password:
         return jsonify({'error': 'Missing required fields'}), 400
 
-    if User.get_by_username(username):
+    if User.identity(username):
         return jsonify({'error': 'Username already taken'}), 409
     
     if User.get_by_email(email):
@@ -102,7 +110,7 @@ def google_callback():
             # Handle username collision
             base_name = name
             counter = 1
-            while User.get_by_username(name):
+            while User.identity(name):
                 name = f"{base_name}{counter}"
                 counter += 1
 
@@ -123,10 +131,8 @@ def google_callback():
 def me():
     """
     Protected endpoint to get the current authenticated user's profile.
-    Requires a valid JWT token in the Authorization header.
+    Requires a valid JWT token in the Authorization header; the user comes
+    from the identity cache through the JWT user lookup.
     """
-    current_username = get_jwt_identity()
-    user = User.get_by_username(current_username)
-    if user:
-        return jsonify({'username': user.username, 'email': user.email})
-    return jsonify({'error': 'User not found'}), 404
+    user = get_current_user()
+    return jsonify({'username': user['username'], 'email': user['email']})
@@ -0,0 +1,20 @@
+LIST_FORMATS = ('rows', 'columns')
+
+def list_payload(result, fmt, columns):
+  """
+  Shapes a list result for the requested format.
+  'rows' (default) keeps `data` as a list of objects; 'columns' replaces it
+  with a `columns` header and `rows` of value arrays, so keys are sent once
+  instead of once per row. `columns` names the fields of an empty page.
+  """
+  if fmt not in LIST_FORMATS:
+    raise ValueError(f"format must be one of: {', '.join(LIST_FORMATS)}")
+  data = result.get('data')
+  if fmt == 'rows' or not isinstance(data, list) or (data and not isinstance(data[0], dict)):
+    return result
+
+  names = list(data[0]) if data else list(columns)
+  payload = {key: value for key, value in result.items() if key != 'data'}
+  payload['columns'] = names
+  payload['rows'] = [[row[name] for name in names] for row in data]
+  return payload
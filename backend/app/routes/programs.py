@@ -1,25 +1,50 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
+from app.routes.conditional import conditional
+from app.routes.streaming import export_response
+from app.routes.formats import list_payload
 from app.models.program import Program
 
 programs_bp = Blueprint('programs', __name__)
 
 @programs_bp.route('', methods=['GET'], strict_slashes=False)
 @jwt_required()
+@conditional('program')
 def get_programs():
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
         search = request.args.get('search')
+        search_mode = request.args.get('search_mode', 'contains')
         only_codes = request.args.get('only_codes', '').lower() == 'true'
+        if only_codes and request.args.get('with_names', '').lower() == 'true':
+            return jsonify({'data': Program.get_codes(), 'names': Program.get_names()}), 200
         sort_by = request.args.get('sort_by', 'program_code')
         order = request.args.get('order', 'asc')
+        cursor = request.args.get('cursor')
+        count = request.args.get('count', 'exact')
         
-        result = Program.get_all(page, per_page, search, only_codes=only_codes, sort_by=sort_by, order=order)
-        return jsonify(result), 200
+        result = Program.get_all(page, per_page, search, only_codes=only_codes, sort_by=sort_by, order=order, cursor=cursor, count=count, search_mode=search_mode)
+        return jsonify(list_payload(result, request.args.get('format', 'rows'), Program.COLUMNS)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@programs_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_programs():
+    try:
+        rows = Program.export_rows(
+            search_term=request.args.get('search'),
+            sort_by=request.args.get('sort_by', 'program_code'),
+            order=request.args.get('order', 'asc'),
+            search_mode=request.args.get('search_mode', 'contains')
+        )
+        return export_response(Program.COLUMNS, rows, request.args.get('format', 'csv'), 'programs')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @programs_bp.route('', methods=['POST'], strict_slashes=False)
 @jwt_required()
 def create_program():
@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from app.models.stats import EnrollmentStats
+
+stats_bp = Blueprint('stats', __name__)
+
+@stats_bp.route('', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def get_stats():
+  """Enrollment headcounts per college, program, year level and gender, with the time they last changed."""
+  try:
+    return jsonify(EnrollmentStats.summary()), 200
+  except Exception as e:
+    return jsonify({'error': str(e)}), 500
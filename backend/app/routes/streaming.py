@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+ROWS_PER_CHUNK = 500
+
+def export_response(columns, rows, fmt, filename):
+  """
+  Streams `rows` (tuples in `columns` order) as a CSV or NDJSON download.
+  Output is flushed every ROWS_PER_CHUNK rows, so the body is never built in memory.
+  """
+  if fmt not in EXPORT_FORMATS:
+    raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+  def generate():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+      writer.writerow(columns)
+    for i, row in enumerate(rows, start=1):
+      if fmt == 'csv':
+        writer.writerow(row)
+      else:
+        buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+        buffer.write('\n')
+      if i % ROWS_PER_CHUNK == 0:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+  mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+  return Response(
+    stream_with_context(generate()),
+    mimetype=mimetype,
+    headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+  )
@@ -1,42 +1,80 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from flask_jwt_extended import jwt_required
+from app.routes.conditional import conditional
+from app.routes.streaming import export_response
+from app.routes.formats import list_payload
 from app.models.student import Student
+from app.db.bulk import iter_records
+from app.jobs import photo_jobs, QueueFull
 
 students_bp = Blueprint('students', __name__)
 
+def filter_args(args):
+  """Search and filter query parameters shared by the list and export endpoints (and app.asgi)."""
+  return {
+    'search_term': args.get('search'),
+    'search_mode': args.get('search_mode', 'contains'),
+    'program_code': args.getlist('program_code[]') or args.getlist('program_code'),
+    'year_level': args.getlist('year_level[]') or args.getlist('year_level'),
+    'gender': args.getlist('gender[]') or args.getlist('gender'),
+  }
+
 @students_bp.route('', methods=['GET'], strict_slashes=False)
 @jwt_required()
+@conditional('student')
 def get_students():
-  """Get all students with pagination, optionally filtered by program_code or a search query."""
+  """
+  Get all students with pagination, optionally filtered by program_code or a search query.
+  Passing `cursor` (empty for the first page) switches to keyset pagination.
+  `count` is exact (default, cached), estimate (planner estimate) or none.
+  `search_mode=prefix` matches the start of fields only; `sort_by=relevance` ranks search hits.
+  `format=columns` returns a `columns` header plus `rows` arrays instead of `data` objects.
+  `facets=true` adds per-value counts for program_code, year_level and gender.
+  """
   try:
     # Pagination params
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 10))
-    program_code = request.args.getlist('program_code[]') or request.args.getlist('program_code')
-    year_level = request.args.getlist('year_level[]') or request.args.getlist('year_level')
-    gender = request.args.getlist('gender[]') or request.args.getlist('gender')
-    search = request.args.get('search')
     sort_by = request.args.get('sort_by', 'student_id')
     order = request.args.get('order', 'asc')
-    only_codes = request.args.get('only_codes') == 'true'
+    only_codes = request.args.get('only_codes', '').lower() == 'true'
+    cursor = request.args.get('cursor')
+    count = request.args.get('count', 'exact')
+    facets = request.args.get('facets', '').lower() == 'true'
     
     # Get paginated results
     result = Student.get_all(
         page=page,
         per_page=per_page,
-        search_term=search,
-        program_code=program_code,
-        year_level=year_level,
-        gender=gender,
+        **filter_args(request.args),
         sort_by=sort_by,
         order=order,
-        only_codes=only_codes
+        only_codes=only_codes,
+        cursor=cursor,
+        count=count,
+        facets=facets
     )
     
-    return jsonify(result), 200
+    return jsonify(list_payload(result, request.args.get('format', 'rows'), Student.COLUMNS + ('photo_urls',))), 200
+  except ValueError as e:
+    return jsonify({'error': str(e)}), 400
   except Exception as e:
     return jsonify({'error': str(e)}), 500
 
+@students_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_students():
+  """Stream every student matching the list filters as CSV (default) or NDJSON."""
+  try:
+    rows = Student.export_rows(
+      sort_by=request.args.get('sort_by', 'student_id'),
+      order=request.args.get('order', 'asc'),
+      **filter_args(request.args)
+    )
+    return export_response(Student.COLUMNS, rows, request.args.get('format', 'csv'), 'students')
+  except ValueError as e:
+    return jsonify({'error': str(e)}), 400
+
 @students_bp.route('', methods=['POST'], strict_slashes=False)
 @jwt_required()
 def create_student():
@@ -67,8 +105,59 @@ def create_student():
   except Exception as e:
     return jsonify({'error': str(e)}), 500
 
+NDJSON_MIMETYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl'}
+
+@students_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_students():
+  """
+  Bulk create/update students from a CSV (with header row) or NDJSON body,
+  or a multipart `file`. The format comes from ?format= or the content type.
+  """
+  try:
+    fmt = request.args.get('format')
+    if request.mimetype == 'multipart/form-data':
+      upload = request.files.get('file')
+      if not upload:
+        return jsonify({'error': 'No file part'}), 400
+      stream = upload.stream
+      fmt = fmt or ('ndjson' if upload.filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv')
+    else:
+      stream = request.stream
+      fmt = fmt or ('ndjson' if request.mimetype in NDJSON_MIMETYPES else 'csv')
+
+    result = Student.import_rows(iter_records(stream, fmt))
+    return jsonify(result), 200
+  except ValueError as e:
+    return jsonify({'error': str(e)}), 400
+  except Exception as e:
+    return jsonify({'error': str(e)}), 500
+
+@students_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_students():
+  """
+  Apply many create/update/delete operations in one transaction.
+  Body: {"mode": "atomic" | "partial", "operations": [{"op": "update", "student_id": ..., "data": {...}}, ...]}
+  """
+  try:
+    data = request.get_json()
+    if not data:
+      return jsonify({'error': 'Request body is empty'}), 400
+    mode = data.get('mode', 'atomic')
+    if mode not in ('atomic', 'partial'):
+      return jsonify({'error': 'mode must be atomic or partial'}), 400
+
+    result = Student.batch(data.get('operations'), atomic=mode == 'atomic')
+    return jsonify(result), 200 if result['committed'] else 400
+  except ValueError as e:
+    return jsonify({'error': str(e)}), 400
+  except Exception as e:
+    return jsonify({'error': str(e)}), 500
+
 @students_bp.route('/<id>', methods=['GET'])
 @jwt_required()
+@conditional('student')
 def get_student(id):
   """Get a specific student by ID."""
   try:
@@ -129,6 +218,7 @@ def allowed_file(filename):
 @students_bp.route('/<id>/photo', methods=['POST'])
 @jwt_required()
 def upload_photo(id):
+  """Queues a photo upload; returns 202 with a job id to poll."""
   if 'file' not in request.files:
     return jsonify({'error': 'No file part'}), 400
   
@@ -138,11 +228,24 @@ def upload_photo(id):
     return jsonify({'error': 'No selected file'}), 400
       
   if file and allowed_file(file.filename):
-    success, message, photo_url = Student.upload_photo(id, file)
-    
+    try:
+      success, message, job_id = Student.upload_photo(id, file)
+    except QueueFull as e:
+      return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+
     if success:
-        return jsonify({'message': message, 'photo_url': photo_url})
+        status_url = url_for('students.photo_job', id=id, job_id=job_id)
+        return jsonify({'message': message, 'job_id': job_id, 'status_url': status_url}), 202, {'Location': status_url}
     else:
         return jsonify({'error': message}), 500
           
   return jsonify({'error': 'File type not allowed'}), 400
+
+@students_bp.route('/<id>/photo/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def photo_job(id, job_id):
+  """Status of a queued photo upload: queued, running, done (with photo_url) or failed."""
+  job = photo_jobs.get(job_id)
+  if not job or job.get('student_id') != id:
+    return jsonify({'error': 'Job not found'}), 404
+  return jsonify(job), 200
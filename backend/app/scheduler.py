@@ -0,0 +1,66 @@
+import os
+import threading
+from functools import wraps
+import psycopg2
+
+# Arbitrary key for pg_try_advisory_lock, next to app.db.migrations.LOCK_KEY
+LEADER_LOCK_KEY = 5_181_001
+
+class Leadership:
+  """
+  Elects one process of the cluster to run the periodic jobs. Every worker
+  starts its own APScheduler, but a job only does its work in the process
+  whose session holds a Postgres advisory lock. The lock is tried again on
+  every tick, so when the leader exits (and its session with it) another
+  worker takes over on its next run.
+  """
+  def __init__(self, key):
+    self.key = key
+    self._conn = None
+    self._held = False
+    self._pid = None
+    self._lock = threading.Lock()
+
+  def is_leader(self):
+    with self._lock:
+      if self._pid != os.getpid():
+        # A session inherited across fork() is the parent's; leave it open for it
+        self._conn, self._held, self._pid = None, False, os.getpid()
+      try:
+        if self._conn is None or self._conn.closed:
+          self._conn, self._held = self._connect(), False
+        with self._conn.cursor() as cur:
+          if self._held:
+            # The lock lives as long as the session; just check it is still up
+            cur.execute('SELECT 1')
+          else:
+            cur.execute('SELECT pg_try_advisory_lock(%s)', (self.key,))
+            self._held = cur.fetchone()[0]
+      except psycopg2.Error:
+        self._release()
+      return self._held
+
+  def stats(self):
+    return {'leader': self._held and self._pid == os.getpid()}
+
+  def _connect(self):
+    from app.db import get_pool
+    # Outside the pool: the session must stay open (and keep the lock) between ticks
+    conn = psycopg2.connect(**get_pool().dsn)
+    conn.autocommit = True
+    return conn
+
+  def _release(self):
+    if self._conn is not None and not self._conn.closed:
+      self._conn.close()
+    self._conn, self._held = None, False
+
+leadership = Leadership(LEADER_LOCK_KEY)
+
+def leader_only(job):
+  """Runs a scheduled job only in the elected process."""
+  @wraps(job)
+  def wrapper(*args, **kwargs):
+    if leadership.is_leader():
+      return job(*args, **kwargs)
+  return wrapper
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from flask import Response, jsonify, request, send_file
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+# Vite writes content-hashed names like assets/index-BxY3k9aZ.js, which never change content
+HASHED_ASSET = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Precompressed siblings, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.wasm'}
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSORS = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+if brotli is not None:
+  COMPRESSORS.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+class StaticIndex:
+  """
+  Snapshot of the React build folder taken once, at startup.
+  Lookups never touch the filesystem, index.html (and its precompressed
+  variants) are held in memory, and a .br/.gz sibling is served when the
+  client accepts it. Rebuilding the frontend needs an app restart.
+  """
+  def __init__(self, folder):
+    self.folder = folder
+    self.files = {}
+    self.index = None
+    self.scan()
+
+  def scan(self):
+    files = {}
+    if os.path.isdir(self.folder):
+      for root, _, names in os.walk(self.folder):
+        for name in names:
+          full = os.path.join(root, name)
+          rel = os.path.relpath(full, self.folder).replace(os.sep, '/')
+          if rel.endswith(tuple(ext for _, ext in ENCODINGS)):
+            continue
+          mtime = os.path.getmtime(full)
+          files[rel] = {
+            'path': full,
+            # A sibling older than its source is left over from a previous build
+            'encodings': {
+              encoding: full + ext for encoding, ext in ENCODINGS
+              if os.path.isfile(full + ext) and os.path.getmtime(full + ext) >= mtime
+            },
+            'cache_control': IMMUTABLE if HASHED_ASSET.match(rel) else REVALIDATE
+          }
+
+    index = files.get('index.html')
+    if index:
+      with open(index['path'], 'rb') as f:
+        body = f.read()
+      variants = {None: body}
+      for encoding, path in index['encodings'].items():
+        with open(path, 'rb') as f:
+          variants[encoding] = f.read()
+      self.index = {'variants': variants, 'etag': hashlib.sha1(body).hexdigest()[:20]}
+    else:
+      self.index = None
+    self.files = files
+
+  def _encoding(self, available):
+    for encoding, _ in ENCODINGS:
+      if encoding in available and request.accept_encodings[encoding]:
+        return encoding
+    return None
+
+  def serve(self, path):
+    """Response for a frontend path: a build file if one matches, otherwise index.html."""
+    entry = self.files.get(path) if path else None
+    if entry is None or path == 'index.html':
+      return self._serve_index()
+
+    encoding = self._encoding(entry['encodings'])
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = send_file(
+      entry['encodings'][encoding] if encoding else entry['path'],
+      mimetype=mimetype,
+      conditional=True
+    )
+    if encoding:
+      response.headers['Content-Encoding'] = encoding
+    if entry['encodings']:
+      response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = entry['cache_control']
+    return response
+
+  def _serve_index(self):
+    if self.index is None:
+      return jsonify({'error': 'React build not found. Please run npm run build'}), 404
+    variants = self.index['variants']
+    encoding = self._encoding(variants)
+    response = Response(variants[encoding], mimetype='text/html')
+    if encoding:
+      response.headers['Content-Encoding'] = encoding
+    if len(variants) > 1:
+      response.vary.add('Accept-Encoding')
+    # Must revalidate: it names the current hashed bundles
+    response.headers['Cache-Control'] = REVALIDATE
+    response.set_etag(f'{self.index["etag"]}-{encoding or "identity"}')
+    return response.make_conditional(request)
+
+def compress_folder(folder):
+  """
+  Writes .gz (and .br when the brotli package is installed) next to each
+  compressible build file, skipping ones already up to date.
+  Returns the number of files written.
+  """
+  written = 0
+  for root, _, names in os.walk(folder):
+    for name in names:
+      full = os.path.join(root, name)
+      if os.path.splitext(name)[1].lower() not in COMPRESSIBLE or os.path.getsize(full) < MIN_COMPRESS_SIZE:
+        continue
+      mtime = os.path.getmtime(full)
+      data = None
+      for ext, compress in COMPRESSORS:
+        target = full + ext
+        if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+          continue
+        if data is None:
+          with open(full, 'rb') as f:
+            data = f.read()
+        compressed = compress(data)
+        # A sibling that saves nothing would only cost a Content-Encoding round trip
+        if len(compressed) >= len(data):
+          continue
+        with open(target, 'wb') as f:
+          f.write(compressed)
+        written += 1
+  return written
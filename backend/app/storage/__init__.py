@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+import threading
+from app.config import Config
+from app.storage.backends import CHUNK_SIZE, StorageBackend, SupabaseStorage, LocalStorage
+
+STORAGE_BACKENDS = ('supabase', 'local')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_storage():
+  """The configured storage backend, built once per process."""
+  global _backend
+  if _backend is None:
+    with _backend_lock:
+      if _backend is None:
+        _backend = _build(Config.STORAGE_BACKEND)
+  return _backend
+
+def _build(name):
+  if name == 'supabase':
+    if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
+      raise ValueError('Supabase credentials missing')
+    return SupabaseStorage(Config.SUPABASE_URL, Config.SUPABASE_KEY, Config.STORAGE_BUCKET)
+  if name == 'local':
+    return LocalStorage(Config.LOCAL_STORAGE_DIR, Config.LOCAL_STORAGE_URL)
+  raise ValueError(f"STORAGE_BACKEND must be one of: {', '.join(STORAGE_BACKENDS)}")
+
+def spool(stream):
+  """
+  Copies an upload stream to a temporary file in fixed-size chunks and
+  returns its path. The copy outlives the request, so a background job can
+  read it after the request's own stream is closed. The caller removes it.
+  """
+  fd, path = tempfile.mkstemp(prefix='upload_', dir=Config.UPLOAD_SPOOL_DIR)
+  try:
+    with os.fdopen(fd, 'wb') as out:
+      shutil.copyfileobj(stream, out, CHUNK_SIZE)
+  except BaseException:
+    os.unlink(path)
+    raise
+  return path
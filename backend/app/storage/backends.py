@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import quote
+
+CHUNK_SIZE = 64 * 1024
+
+class StorageBackend:
+  """Where uploaded files live. `key` is a '/'-separated path inside the backend."""
+  def upload(self, key, source_path, content_type):
+    """Stores the file at `source_path` under `key`, streaming it in chunks."""
+    raise NotImplementedError
+
+  def public_url(self, key):
+    raise NotImplementedError
+
+  def delete(self, key):
+    raise NotImplementedError
+
+class SupabaseStorage(StorageBackend):
+  """
+  Supabase Storage bucket behind one long-lived client.
+  The client keeps its HTTP connection pool between uploads, so only the
+  first upload pays for the TLS handshake.
+  """
+  def __init__(self, url, key, bucket):
+    self.url = url
+    self.key = key
+    self.bucket = bucket
+    self._client = None
+    self._lock = threading.Lock()
+
+  def _bucket(self):
+    if self._client is None:
+      with self._lock:
+        if self._client is None:
+          from supabase import create_client
+          client = create_client(self.url, self.key)
+          storage_url = str(client.storage_url)
+          if not storage_url.endswith('/'):
+            client.storage_url = storage_url + '/'
+          self._client = client
+    return self._client.storage.from_(self.bucket)
+
+  def upload(self, key, source_path, content_type):
+    # A file object makes the HTTP client send the body in chunks rather than as one buffer
+    with open(source_path, 'rb') as f:
+      self._bucket().upload(path=key, file=f, file_options={'content-type': content_type})
+
+  def public_url(self, key):
+    return self._bucket().get_public_url(key)
+
+  def delete(self, key):
+    self._bucket().remove([key])
+
+class LocalStorage(StorageBackend):
+  """Files under a local directory, served by the app at `base_url`. For tests and offline setups."""
+  def __init__(self, root, base_url):
+    self.root = os.path.abspath(root)
+    self.base_url = base_url.rstrip('/')
+
+  def path(self, key):
+    path = os.path.abspath(os.path.join(self.root, *key.split('/')))
+    if os.path.commonpath([self.root, path]) != self.root:
+      raise ValueError('Invalid storage key')
+    return path
+
+  def upload(self, key, source_path, content_type):
+    target = self.path(key)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Write beside the target and rename, so readers never see a partial file
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.part')
+    try:
+      with os.fdopen(fd, 'wb') as out, open(source_path, 'rb') as src:
+        shutil.copyfileobj(src, out, CHUNK_SIZE)
+      os.replace(partial, target)
+    except BaseException:
+      os.unlink(partial)
+      raise
+
+  def public_url(self, key):
+    return f'{self.base_url}/{quote(key)}'
+
+  def delete(self, key):
+    try:
+      os.remove(self.path(key))
+    except FileNotFoundError:
+      pass
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+from app.config import Config
+
+# Derivative name -> longest side in pixels, smallest first
+DERIVATIVES = (('thumb', 128), ('medium', 512))
+DERIVATIVE_FORMAT = 'webp'
+DERIVATIVE_QUALITY = 80
+
+# Stored photos with derivatives live in their own folder as original.<ext>,
+# thumb.webp and medium.webp; a URL ending in original.<ext> implies the rest.
+ORIGINAL_NAME = 'original'
+
+# Workers are started from a clean forkserver process (spawned on Windows), not
+# forked from the server: a fork taken while other threads hold locks (logging,
+# the database pool, Pillow's) can leave the child deadlocked on them.
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+  global _executor, _executor_pid
+  with _executor_lock:
+    if _executor is None or _executor_pid != os.getpid():
+      _executor = ProcessPoolExecutor(
+        max_workers=Config.IMAGE_WORKERS,
+        mp_context=multiprocessing.get_context(_START_METHOD)
+      )
+      _executor_pid = os.getpid()
+    return _executor
+
+def make_derivatives(source_path):
+  """
+  Resizes an image into every derivative in a worker process, blocking the
+  calling (background) thread only. Returns {name: temp file path}; the
+  caller removes the files. Raises ValueError if the file is not an image.
+  """
+  return _get_executor().submit(_render, source_path, tempfile.gettempdir()).result()
+
+def _render(source_path, out_dir):
+  try:
+    image = Image.open(source_path)
+    # Let JPEG decode at a reduced scale; the largest derivative is all we need
+    image.draft('RGB', (DERIVATIVES[-1][1], DERIVATIVES[-1][1]))
+    image = ImageOps.exif_transpose(image)
+  except (OSError, SyntaxError):
+    raise ValueError('Invalid image file')
+  image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+  paths = {}
+  try:
+    # Largest first, so each smaller size is resampled from fewer pixels
+    for name, size in reversed(DERIVATIVES):
+      image.thumbnail((size, size), Image.LANCZOS)
+      fd, path = tempfile.mkstemp(prefix=f'{name}_', suffix=f'.{DERIVATIVE_FORMAT}', dir=out_dir)
+      paths[name] = path
+      with os.fdopen(fd, 'wb') as out:
+        image.save(out, DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY, method=4)
+  except Exception:
+    for path in paths.values():
+      os.unlink(path)
+    raise
+  return paths
+
+def derivative_key(original_key, name):
+  return original_key.rsplit('/', 1)[0] + f'/{name}.{DERIVATIVE_FORMAT}'
+
+def photo_urls(photo_url):
+  """
+  All stored sizes of a photo, smallest first, derived from the original's URL.
+  Photos uploaded before derivatives existed only have 'original'.
+  """
+  if not photo_url:
+    return None
+  base, _, filename = photo_url.rpartition('/')
+  if not filename.startswith(ORIGINAL_NAME + '.'):
+    return {'original': photo_url}
+  urls = {name: f'{base}/{name}.{DERIVATIVE_FORMAT}' for name, _ in DERIVATIVES}
+  urls['original'] = photo_url
+  return urls
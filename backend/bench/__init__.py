@@ -0,0 +1,5 @@
+"""
+Benchmark tooling: `python -m bench.seed` fills a database with synthetic
+data and `python -m bench.run` measures the API against it. Run both from
+the backend directory with the usual .env pointing at a scratch database.
+"""
@@ -0,0 +1,265 @@
+"""
+Drives the real app (create_app + test client) through every endpoint and
+reports latency percentiles, throughput and database queries per request.
+Usage: python -m bench.run --help
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+import psycopg2.extensions
+import app.db.pool as pool_module
+from bench.seed import BENCH_USER, BENCH_PASSWORD
+
+# Writes use ids the seeder never generates
+WRITE_ID_PREFIX = '9999-'
+
+_local = threading.local()
+
+def _tick():
+  _local.queries = getattr(_local, 'queries', 0) + 1
+
+def queries_so_far():
+  return getattr(_local, 'queries', 0)
+
+class _Counting:
+  def execute(self, query, vars=None):
+    _tick()
+    return super().execute(query, vars)
+
+  def executemany(self, query, vars_list):
+    _tick()
+    return super().executemany(query, vars_list)
+
+  def copy_expert(self, sql, file, size=8192):
+    _tick()
+    return super().copy_expert(sql, file, size)
+
+_counting_classes = {}
+
+def _counting(factory):
+  if factory not in _counting_classes:
+    _counting_classes[factory] = type(f'Counting{factory.__name__}', (_Counting, factory), {})
+  return _counting_classes[factory]
+
+class CountingConnection(pool_module.PooledConnection):
+  """Pooled connection whose cursors count the statements they run on the calling thread."""
+  def cursor(self, *args, **kwargs):
+    factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+    return super().cursor(*args, cursor_factory=_counting(factory), **kwargs)
+
+# Filters and searches of the student list; every sort is also run under each,
+# since the index that serves a sort can change once the rows are narrowed
+NARROWING = {
+  'filter_program': '&program_code[]=P00101&program_code[]=None',
+  'filter_year': '&year_level[]=2&year_level[]=3',
+  'filter_gender': '&gender[]=Female',
+  'filter_all': '&program_code[]=P00102&year_level[]=1&gender[]=Male',
+  'search': '&search=san',
+  'search_prefix': '&search=ca&search_mode=prefix',
+}
+SORT_COLUMNS = ('student_id', 'first_name', 'last_name', 'year_level', 'gender', 'program_code')
+# Report column wide enough for the longest scenario name
+NAME_WIDTH = 48
+
+def build_scenarios(total_pages):
+  """name -> (method, url(i), json body(i) or None). Run in this order; writes are last."""
+  def fixed(url):
+    return lambda i: url
+
+  def write_id(i):
+    return f'{WRITE_ID_PREFIX}{i:04d}'
+
+  scenarios = {
+    'students_list': ('GET', fixed('/api/students?per_page=10'), None),
+    'students_list_100': ('GET', fixed('/api/students?per_page=100'), None),
+    'students_list_columns': ('GET', fixed('/api/students?per_page=100&format=columns'), None),
+    'students_deep_page': ('GET', fixed(f'/api/students?per_page=10&page={total_pages}'), None),
+    'students_cursor_first': ('GET', fixed('/api/students?per_page=10&cursor='), None),
+    'students_count_none': ('GET', fixed('/api/students?per_page=10&count=none'), None),
+    'students_count_estimate': ('GET', fixed('/api/students?per_page=10&count=estimate'), None),
+    'students_facets': ('GET', fixed('/api/students?per_page=10&facets=true'), None),
+    'students_search': ('GET', fixed('/api/students?per_page=10' + NARROWING['search']), None),
+    'students_search_prefix': ('GET', fixed('/api/students?per_page=10' + NARROWING['search_prefix']), None),
+    'students_search_relevance': ('GET', fixed('/api/students?per_page=10&search=ana&sort_by=relevance'), None),
+    # Different search terms every time, so nothing is served from the count cache
+    'students_search_uncached': ('GET', lambda i: f'/api/students?per_page=10&search={i:04d}', None),
+    'students_filter_program': ('GET', fixed('/api/students?per_page=10' + NARROWING['filter_program']), None),
+    'students_filter_year': ('GET', fixed('/api/students?per_page=10' + NARROWING['filter_year']), None),
+    'students_filter_gender': ('GET', fixed('/api/students?per_page=10' + NARROWING['filter_gender']), None),
+    'students_filter_all': ('GET', fixed('/api/students?per_page=10' + NARROWING['filter_all']), None),
+    'student_detail': ('GET', lambda i: f'/api/students/1000-{i % 10000:04d}', None),
+    'colleges_list': ('GET', fixed('/api/colleges?per_page=10'), None),
+    'programs_list': ('GET', fixed('/api/programs?per_page=10&search=college'), None),
+    'program_codes': ('GET', fixed('/api/programs?only_codes=true'), None),
+    'stats': ('GET', fixed('/api/stats'), None),
+    'students_export_year': ('GET', fixed('/api/students/export?year_level[]=1'), None),
+    'health': ('GET', fixed('/api/health'), None),
+    'auth_me': ('GET', fixed('/api/auth/me'), None),
+    'login': ('POST', fixed('/api/auth/login'), lambda i: {'username': BENCH_USER, 'password': BENCH_PASSWORD}),
+    'student_create': ('POST', fixed('/api/students'), lambda i: {
+      'id': write_id(i), 'firstname': 'Bench', 'lastname': 'Mark', 'year': 1 + i % 4,
+      'gender': 'Female', 'program': 'P00101'
+    }),
+    'student_update': ('PUT', lambda i: f'/api/students/{write_id(i)}', lambda i: {
+      'id': write_id(i), 'firstname': 'Bench', 'lastname': 'Updated', 'year': 1 + (i + 1) % 4,
+      'gender': 'Male', 'program': 'P00102'
+    }),
+    'student_delete': ('DELETE', lambda i: f'/api/students/{write_id(i)}', None),
+  }
+  for column in SORT_COLUMNS:
+    for order in ('asc', 'desc'):
+      url = f'/api/students?per_page=10&sort_by={column}&order={order}'
+      scenarios[f'students_sort_{column}_{order}'] = ('GET', fixed(url), None)
+      for name, query in NARROWING.items():
+        scenarios[f'students_sort_{column}_{order}_{name}'] = ('GET', fixed(url + query), None)
+  # Reads first, then create -> update -> delete over the same ids
+  writes = ('login', 'student_create', 'student_update', 'student_delete')
+  return {name: scenarios[name] for name in [n for n in scenarios if n not in writes] + list(writes)}
+
+def percentile(sorted_values, pct):
+  """Nearest-rank percentile of an ascending list."""
+  if not sorted_values:
+    return None
+  rank = max(1, -(-len(sorted_values) * pct // 100))
+  return sorted_values[int(rank) - 1]
+
+def run_scenario(app, headers, spec, iterations, concurrency, warmup):
+  method, url, body = spec
+  latencies = []
+  queries = []
+  errors = []
+  lock = threading.Lock()
+
+  def worker(indexes, record):
+    client = app.test_client()
+    for i in indexes:
+      before = queries_so_far()
+      started = time.perf_counter()
+      response = client.open(url(i), method=method, headers=headers, json=body(i) if body else None)
+      response.get_data()
+      elapsed = time.perf_counter() - started
+      if record:
+        with lock:
+          latencies.append(elapsed)
+          queries.append(queries_so_far() - before)
+          if response.status_code >= 400:
+            errors.append(response.status_code)
+      response.close()
+
+  # Only reads are warmed up; each write id can only be used once
+  worker(range(iterations, iterations + warmup) if method == 'GET' else [], record=False)
+
+  threads = [
+    threading.Thread(target=worker, args=(range(t, iterations, concurrency), True))
+    for t in range(concurrency)
+  ]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  wall = time.perf_counter() - started
+
+  latencies.sort()
+  ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+  return {
+    'requests': len(latencies),
+    'errors': len(errors),
+    'error_statuses': sorted(set(errors)),
+    'p50_ms': ms(percentile(latencies, 50)),
+    'p95_ms': ms(percentile(latencies, 95)),
+    'p99_ms': ms(percentile(latencies, 99)),
+    'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+    'throughput_rps': round(len(latencies) / wall, 1) if wall > 0 else None,
+    'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None
+  }
+
+def compare(results, baseline, threshold):
+  """Prints p95/query deltas against a baseline; returns the scenarios that regressed."""
+  regressions = []
+  print(f'\n{"scenario":<{NAME_WIDTH}}{"p95 base":>10}{"p95 now":>10}{"delta":>9}{"q base":>8}{"q now":>8}')
+  for name, now in results['scenarios'].items():
+    base = baseline.get('scenarios', {}).get(name)
+    if not base or not base.get('p95_ms') or not now.get('p95_ms'):
+      continue
+    delta = (now['p95_ms'] - base['p95_ms']) / base['p95_ms']
+    # Averages, so an occasional pool health check or cache reload doesn't count
+    more_queries = round(now['queries_per_request'] or 0) > round(base['queries_per_request'] or 0)
+    flag = ''
+    if delta > threshold or more_queries:
+      regressions.append(name)
+      flag = '  <- regression'
+    print(f'{name:<{NAME_WIDTH}}{base["p95_ms"]:>10.2f}{now["p95_ms"]:>10.2f}{delta:>+9.0%}'
+          f'{base["queries_per_request"]:>8}{now["queries_per_request"]:>8}{flag}')
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--iterations', type=int, default=200, help='measured requests per scenario')
+  parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests before each read scenario')
+  parser.add_argument('--concurrency', type=int, default=1, help='client threads per scenario')
+  parser.add_argument('--only', help='comma-separated scenario names (or prefixes) to run')
+  parser.add_argument('--output', help='write results as JSON, e.g. bench/results/baseline.json')
+  parser.add_argument('--baseline', help='compare against an earlier --output file')
+  parser.add_argument('--threshold', type=float, default=0.2, help='p95 increase counted as a regression (0.2 = 20%%)')
+  args = parser.parse_args()
+  if args.iterations > 10000:
+    parser.error('--iterations is limited to 10000 (write scenarios use 9999-NNNN ids)')
+
+  pool_module.PooledConnection = CountingConnection
+  from app import create_app
+  from flask_jwt_extended import create_access_token
+  app = create_app()
+
+  with app.app_context():
+    from app.db import get_db
+    headers = {'Authorization': f'Bearer {create_access_token(identity=BENCH_USER)}'}
+    conn = get_db()
+    with conn.cursor() as cur:
+      cur.execute('DELETE FROM student WHERE student_id LIKE %s', (WRITE_ID_PREFIX + '%',))
+      cur.execute('SELECT COUNT(*) FROM student')
+      students = cur.fetchone()[0]
+    conn.commit()
+
+  scenarios = build_scenarios(max(1, -(-students // 10)))
+  if args.only:
+    prefixes = tuple(args.only.split(','))
+    scenarios = {name: spec for name, spec in scenarios.items() if name.startswith(prefixes)}
+
+  results = {
+    'created_at': datetime.now(timezone.utc).isoformat(),
+    'students': students,
+    'iterations': args.iterations,
+    'concurrency': args.concurrency,
+    'python': platform.python_version(),
+    'commit': os.popen('git rev-parse --short HEAD 2>/dev/null').read().strip() or None,
+    'scenarios': {}
+  }
+  print(f'{students} students, {args.iterations} requests x {args.concurrency} threads per scenario\n')
+  print(f'{"scenario":<{NAME_WIDTH}}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"queries":>9}{"errors":>8}')
+  for name, spec in scenarios.items():
+    stats = run_scenario(app, headers, spec, args.iterations, args.concurrency, args.warmup)
+    results['scenarios'][name] = stats
+    print(f'{name:<{NAME_WIDTH}}{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}'
+          f'{stats["throughput_rps"]:>9.1f}{stats["queries_per_request"]:>9}{stats["errors"]:>8}')
+
+  if args.output:
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2)
+    print(f'\nSaved {args.output}')
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+      print(f'\n{len(regressions)} scenario(s) regressed: {", ".join(regressions)}')
+      sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,102 @@
+"""Loads synthetic colleges, programs and students with COPY. Usage: python -m bench.seed --help"""
+import argparse
+import random
+import time
+import psycopg2
+from app.config import Config
+from app.db.bulk import CopyStream
+
+FIRST_NAMES = ('Ana', 'Ben', 'Cara', 'Dan', 'Eve', 'Faye', 'Gio', 'Hana', 'Ivan', 'Jade',
+               'Karl', 'Lea', 'Migo', 'Nina', 'Oscar', 'Pia', 'Quin', 'Rosa', 'Sam', 'Tess')
+LAST_NAMES = ('Cruz', 'Reyes', 'Santos', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Ramos',
+              'Bautista', 'Villanueva', 'Aquino', 'Castillo', 'Navarro', 'Dela Cruz', 'Lim')
+GENDERS = ('Male', 'Female', 'Other', None)
+GENDER_WEIGHTS = (48, 48, 2, 2)
+
+# Login used by the benchmark's login scenario
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+def student_id(n):
+  """YYYY-NNNN ids (the column is varchar(9)); 9999-xxxx is left free for write benchmarks."""
+  return f'{1000 + n // 10000}-{n % 10000:04d}'
+
+def generate_students(count, program_codes, rng, no_program_ratio):
+  for n in range(count):
+    program = None if rng.random() < no_program_ratio else rng.choice(program_codes)
+    yield (
+      student_id(n),
+      rng.choice(FIRST_NAMES),
+      rng.choice(LAST_NAMES),
+      rng.randint(1, 4),
+      rng.choices(GENDERS, GENDER_WEIGHTS)[0],
+      program,
+    )
+
+def connect():
+  return psycopg2.connect(
+    host=Config.DB_HOST, port=Config.DB_PORT, database=Config.DB_NAME,
+    user=Config.DB_USER, password=Config.DB_PASSWORD, sslmode=Config.DB_SSLMODE
+  )
+
+def seed(conn, colleges, programs_per_college, students, reset=False, seed_value=181, no_program_ratio=0.02):
+  rng = random.Random(seed_value)
+  college_rows = [(f'C{i:03d}', f'College {i}') for i in range(1, colleges + 1)]
+  program_rows = [
+    (f'P{c:03d}{p:02d}', f'Program {p} of College {c}', f'C{c:03d}')
+    for c in range(1, colleges + 1) for p in range(1, programs_per_college + 1)
+  ]
+  if students > 89990000:
+    raise ValueError('At most 89,990,000 students fit the YYYY-NNNN id format')
+
+  with conn.cursor() as cur:
+    if reset:
+      cur.execute('TRUNCATE student, program, college')
+    started = time.perf_counter()
+    cur.copy_expert('COPY college (college_code, college_name) FROM STDIN WITH (FORMAT csv)', CopyStream(college_rows))
+    cur.copy_expert('COPY program (program_code, program_name, college_code) FROM STDIN WITH (FORMAT csv)', CopyStream(program_rows))
+    cur.copy_expert(
+      'COPY student (student_id, first_name, last_name, year_level, gender, program_code) FROM STDIN WITH (FORMAT csv)',
+      CopyStream(generate_students(students, [row[0] for row in program_rows], rng, no_program_ratio))
+    )
+    conn.commit()
+    loaded = time.perf_counter() - started
+
+  # Fresh planner statistics, so the benchmark sees production-like plans
+  conn.autocommit = True
+  with conn.cursor() as cur:
+    cur.execute('ANALYZE college, program, student')
+  conn.autocommit = False
+  return loaded
+
+def ensure_bench_user():
+  """Creates the login used by the benchmark, through the app's own model."""
+  from app import create_app
+  from app.models.user import User
+  app = create_app()
+  with app.app_context():
+    if not User.get_by_username(BENCH_USER):
+      User.create(BENCH_USER, f'{BENCH_USER}@example.com', BENCH_PASSWORD)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--colleges', type=int, default=8)
+  parser.add_argument('--programs-per-college', type=int, default=6)
+  parser.add_argument('--students', type=int, default=100000)
+  parser.add_argument('--seed', type=int, default=181, help='random seed, for reproducible data')
+  parser.add_argument('--reset', action='store_true', help='TRUNCATE student, program and college first')
+  args = parser.parse_args()
+
+  conn = connect()
+  print(f'Seeding {Config.DB_NAME} on {Config.DB_HOST}:{Config.DB_PORT}')
+  try:
+    elapsed = seed(conn, args.colleges, args.programs_per_college, args.students, args.reset, args.seed)
+  finally:
+    conn.close()
+  ensure_bench_user()
+  total_programs = args.colleges * args.programs_per_college
+  print(f'Loaded {args.colleges} colleges, {total_programs} programs and {args.students} students '
+        f'in {elapsed:.1f}s ({args.students / max(elapsed, 1e-9):,.0f} students/s)')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,61 @@
+"""
+Production launcher settings, read by gunicorn from this directory:
+
+  gunicorn
+
+Workers and threads follow the CPUs available to the process unless
+WEB_WORKERS / WEB_THREADS say otherwise, and each worker's database pool is
+sized to its threads. The app is loaded once before forking (WEB_PRELOAD);
+pools are opened and the scheduler started in each worker afterwards, and
+the periodic jobs themselves run only in the elected leader (app.scheduler).
+
+Workers see each other's writes through the table_versions triggers
+(app.db.cache.SharedVersions), which `flask migrate` installs; on a database
+without them, run a single worker (WEB_WORKERS=1).
+"""
+import os
+from os import getenv
+
+def _cores():
+  try:
+    return len(os.sched_getaffinity(0))
+  except AttributeError:
+    return os.cpu_count() or 1
+
+# The app package shadows app.py, so gunicorn calls the factory directly
+wsgi_app = 'app:create_app()'
+bind = getenv('BIND', f"0.0.0.0:{getenv('PORT', '5000')}")
+worker_class = 'gthread'
+# Requests mostly wait on Postgres, so a few threads per core keep it busy
+workers = int(getenv('WEB_WORKERS', max(2, _cores())))
+threads = int(getenv('WEB_THREADS', '4'))
+preload_app = getenv('WEB_PRELOAD', 'true').lower() == 'true'
+timeout = int(getenv('WEB_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+accesslog = getenv('WEB_ACCESS_LOG')
+
+# One connection per request thread plus the photo upload workers and an
+# export's streaming cursor; workers * DB_POOL_MAX must fit max_connections
+os.environ.setdefault('DB_POOL_MAX', str(threads + int(getenv('UPLOAD_WORKERS', '2')) + 1))
+os.environ.setdefault('DB_POOL_MIN', '1')
+
+# The preloaded app lives in the master, which serves no requests: it must not
+# open connections or run jobs. Both happen per worker in post_worker_init.
+warm_up = getenv('DB_POOL_WARMUP', 'true').lower() == 'true'
+if preload_app:
+  os.environ['DB_POOL_WARMUP'] = 'false'
+  os.environ['SCHEDULER_AUTOSTART'] = 'false'
+
+def post_worker_init(worker):
+  app = worker.wsgi
+  if not preload_app:
+    return
+  # app.db drops pools inherited across fork(), so this opens the worker's own
+  if warm_up:
+    from app.db import get_pool
+    try:
+      get_pool().warm_up()
+    except Exception as e:
+      worker.log.warning('Database pool warm-up failed: %s', e)
+  app.apscheduler.start()
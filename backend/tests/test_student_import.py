@@ -0,0 +1,26 @@
+import io
+from app.db.bulk import CopyStream, iter_records
+from app.models.student import _staged_rows
+
+HEADER = b'student_id,first_name,last_name,year_level,gender,program_code\n'
+
+def staged(body):
+  counters = {'received': 0}
+  rows = list(_staged_rows(iter_records(io.BytesIO(HEADER + body), 'csv'), counters))
+  return rows, CopyStream(rows).read()
+
+def test_valid_row_has_no_error():
+  rows, _ = staged(b'2023-0001,Ana,Cruz,2,Female,BSCS\n')
+  assert rows == [(2, '2023-0001', 'Ana', 'Cruz', '2', 'Female', 'BSCS', None)]
+
+def test_bad_year_level_is_nulled():
+  rows, _ = staged(b'2023-0001,Ana,Cruz,abc,Female,BSCS\n')
+  assert rows[0][4] is None
+  assert rows[0][7] == 'year_level must be a whole number'
+
+def test_bad_year_level_is_nulled_when_fields_are_missing():
+  rows, copied = staged(b'2023-0001,,Cruz,abc,Male,BSCS\n')
+  assert rows[0][4] is None
+  assert rows[0][7] == 'Missing required fields: first_name; year_level must be a whole number'
+  # The integer staging column receives NULL, not the raw value
+  assert copied.startswith('2,2023-0001,,Cruz,,Male,BSCS,')
@@ -1,7 +1,16 @@
 import { useState, useEffect, useRef } from 'react';
 import '../Components.css';
 
-const MultiSelect = ({ label, options, value, onChange }) => {
+// Facet entries use null for "no value" and numbers for year levels; options are strings
+const facetCounts = (entries) => {
+  const counts = {};
+  (entries || []).forEach(({ value, count }) => {
+    counts[value === null ? 'None' : String(value)] = count;
+  });
+  return counts;
+};
+
+const MultiSelect = ({ label, options, value, onChange, counts }) => {
   const [isOpen, setIsOpen] = useState(false);
   const containerRef = useRef(null);
 
@@ -50,6 +59,7 @@ const MultiSelect = ({ label, options, value, onChange }) => {
                   readOnly 
                 />
                 <span>{option}</span>
+                {counts && <span className="option-count">{counts[option] ?? 0}</span>}
               </div>
             ))}
           </div>
@@ -59,7 +69,7 @@ const MultiSelect = ({ label, options, value, onChange }) => {
   );
 };
 
-const FilterStudentModal = ({ isOpen, onClose, onApply, programs, currentFilters }) => {
+const FilterStudentModal = ({ isOpen, onClose, onApply, programs, currentFilters, facets }) => {
   const [filters, setFilters] = useState({
     program: [],
     year: [],
@@ -115,18 +125,21 @@ const FilterStudentModal = ({ isOpen, onClose, onApply, programs, currentFilters
               options={['None', ...programs]} 
               value={filters.program} 
               onChange={(val) => handleFilterChange('program', val)} 
+              counts={facets && facetCounts(facets.program_code)}
             />
             <MultiSelect 
               label="Year Level" 
               options={['1', '2', '3', '4']} 
               value={filters.year} 
               onChange={(val) => handleFilterChange('year', val)} 
+              counts={facets && facetCounts(facets.year_level)}
             />
             <MultiSelect 
               label="Gender" 
               options={['Male', 'Female', 'Other']} 
               value={filters.gender} 
               onChange={(val) => handleFilterChange('gender', val)} 
+              counts={facets && facetCounts(facets.gender)}
             />
             <div className="form-actions">
               <button type="button" className="btn btn-secondary" onClick={handleReset}>Reset Filters</button>
@@ -2,6 +2,21 @@ import { useState } from 'react';
 import { studentsAPI } from '../../services/api';
 import '../Components.css';
 
+const POLL_INTERVAL_MS = 500;
+const POLL_TIMEOUT_MS = 60 * 1000;
+
+// Uploads are stored in the background; wait until the job has finished
+const waitForPhotoJob = async (studentId, jobId) => {
+  const deadline = Date.now() + POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const { data } = await studentsAPI.getPhotoJob(studentId, jobId);
+    if (data.status === 'done') return data;
+    if (data.status === 'failed') throw new Error(data.error || 'Upload failed');
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+  throw new Error('The upload is taking longer than expected; refresh to see if it finished');
+};
+
 const UploadPhotoModal = ({ isOpen, onClose, student, onSuccess }) => {
   const [file, setFile] = useState(null);
   const [error, setError] = useState('');
@@ -48,12 +63,13 @@ const UploadPhotoModal = ({ isOpen, onClose, student, onSuccess }) => {
     formData.append('file', file);
 
     try {
-      await studentsAPI.uploadPhoto(student.id, formData);
+      const { data } = await studentsAPI.uploadPhoto(student.id, formData);
+      await waitForPhotoJob(student.id, data.job_id);
       onSuccess();
       onClose();
     } catch (err) {
       console.error(err);
-      setError(err.response?.data?.error || 'Upload failed');
+      setError(err.response?.data?.error || err.message || 'Upload failed');
     } finally {
       setUploading(false);
     }
@@ -38,6 +38,7 @@ export default function Students() {
   const [filterProgram, setFilterProgram] = useState([]);
   const [filterYear, setFilterYear] = useState([]);
   const [filterGender, setFilterGender] = useState([]);
+  const [facets, setFacets] = useState(null);
 
   const clearStudentCache = () => {
     Object.keys(sessionStorage).forEach(key => {
@@ -143,13 +144,14 @@ export default function Students() {
     const activeGender = filters.gender !== undefined ? filters.gender : filterGender;
       
       const cacheKey = `students_${currentPage}_${perPage}_${searchTerm}_${backendSortBy}_${order}_${activeProgram}_${activeYear}_${activeGender}`;
-      let data, total;
+      let data, total, facetCounts;
 
       const cached = sessionStorage.getItem(cacheKey);
       if (cached && !background) {
         const parsed = JSON.parse(cached);
         data = parsed.data;
         total = parsed.total;
+        facetCounts = parsed.facets;
       } else {
         const params = {
           page: currentPage,
@@ -164,11 +166,13 @@ export default function Students() {
         if (activeGender && activeGender.length > 0) params.gender = activeGender;
         params.sort_by = backendSortBy;
         params.order = order;
+        params.facets = true;
   
         const response = await studentsAPI.getAll(params);
         data = response.data.data;
         total = response.data.total;
-        sessionStorage.setItem(cacheKey, JSON.stringify({ data, total }));
+        facetCounts = response.data.facets;
+        sessionStorage.setItem(cacheKey, JSON.stringify({ data, total, facets: facetCounts }));
       }
 
       const formattedData = data.map(student => ({
@@ -195,6 +199,7 @@ export default function Students() {
 
       setStudentData(formattedData);
       setTotalCount(total);
+      setFacets(facetCounts || null);
       setError(null);
     } catch (err) {
       console.error('Error fetching students:', err);
@@ -380,6 +385,7 @@ export default function Students() {
           onApply={handleFilterApply}
           programs={programsList}
           currentFilters={{ program: filterProgram, year: filterYear, gender: filterGender }}
+          facets={facets}
         />
       )}
     </>
@@ -64,6 +64,7 @@ export const studentsAPI = {
   uploadPhoto: (id, formData) => api.post(`/students/${id}/photo`, formData, {
     headers: { 'Content-Type': 'multipart/form-data' }
   }),
+  getPhotoJob: (id, jobId) => api.get(`/students/${id}/photo/jobs/${jobId}`),
 };
 
 export default api;
\ No newline at end of file